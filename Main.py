@@ -1,7 +1,21 @@
 from dotenv import load_dotenv
 import os
-import types
+import io
+import threading
+import time
+import importlib
+from collections import Counter
 import neo4j_db_connector as nc
+from neo4j_async_connector import AsyncNeo4jConnection
+import schema_manager
+from model_snapshot import ModelSnapshot
+from model_registry import get_node_registry, get_relation_registry
+import model_version
+import rule_engine
+import model_cleanup
+import graph_layout
+import model_io
+import query_stats
 import pandas as pd
 
 import streamlit as st
@@ -10,38 +24,162 @@ import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
 
-import b2c_relations
-import b2c_nodes
-import b2c_rules
-from b2c_generator import get_events
-
-import robot_nodes
-import robot_relations
-import robot_rules
-from robot_generator_turtle import get_template
+# Предел числа элементов (узлов и связей), отрисовываемых на графе без группировки
+MAX_GRAPH_ELEMENTS = 300
+
+# Интервал (в секундах) между попытками создать асинхронное соединение после неудачи
+ASYNC_RETRY_INTERVAL = 60
+
+# Пользователи, которым доступна статистика запросов к базе (через запятую)
+ADMIN_USERS = [u.strip() for u in os.getenv("ADMIN_USERS", "").split(',') if u.strip()]
+
+# Задачи: модули с префиксом prefix импортируются только при открытии задачи
+TASKS = {
+    'Робот': {'task_label': 'Robot', 'prefix': 'robot', 'title': 'Моделирование траектории робота'},
+    'B2C': {'task_label': 'B2C', 'prefix': 'b2c', 'title': 'Аналитика пользовательского поведения в B2C-сервисе'},
+}
+
+
+@st.cache_resource
+def get_connection():
+    """Соединение, общее для всех сессий и перезапусков скрипта; создается один раз на процесс"""
+    connection = nc.Neo4jConnection(uri=os.getenv("NEO4J_URI"),
+                                    user=os.getenv("NEO4J_USERNAME"),
+                                    pwd=os.getenv("NEO4J_PASSWORD"))
+    # узел версии модели должен быть единственным для пары (задача, пользователь)
+    schema_manager.ensure_version_constraint(connection)
+    return connection
+
+
+@st.cache_resource
+def get_async_state():
+    """Асинхронное соединение, общее для процесса, и время последней неудачной попытки его создать"""
+    return {'connection': None, 'failed_at': None, 'lock': threading.Lock()}
+
+
+def get_read_connection():
+    """Соединение для многозапросных чтений (генераторы): асинхронное для одновременного выполнения
+    независимых запросов на чтение, а без него — обычное. После неудачи новая попытка создать
+    асинхронный драйвер делается не раньше чем через ASYNC_RETRY_INTERVAL секунд"""
+    state = get_async_state()
+    with state['lock']:
+        if state['connection'] is None and (state['failed_at'] is None
+                                            or time.monotonic() - state['failed_at'] >= ASYNC_RETRY_INTERVAL):
+            try:
+                state['connection'] = AsyncNeo4jConnection(uri=os.getenv("NEO4J_URI"),
+                                                           user=os.getenv("NEO4J_USERNAME"),
+                                                           pwd=os.getenv("NEO4J_PASSWORD"),
+                                                           bookmark_manager=conn.bookmark_manager)
+            except Exception as e:
+                query_stats.logger.warning("Async connection is unavailable, falling back to sequential reads: %s", e)
+                state['failed_at'] = time.monotonic()
+    return state['connection'] or conn
 
 
 # ИЗМЕНЕНО: Обернуто в try-except для обработки ошибок подключения при запуске
 try:
     load_dotenv()
-    conn = nc.Neo4jConnection(uri=os.getenv("NEO4J_URI"),
-                              user=os.getenv("NEO4J_USERNAME"),
-                              pwd=os.getenv("NEO4J_PASSWORD"))
-    # Пробный запрос для проверки соединения
-    conn.query("MATCH (n) RETURN count(n) as count")
+    conn = get_connection()
+    # Проверка соединения выполняется только после ошибки или долгого простоя
+    conn.ensure_alive()
 except Exception as e:
     st.error(f"Критическая ошибка: Не удалось подключиться к базе данных Neo4j. Проверьте переменные окружения и доступность базы. Ошибка: {e}")
     st.stop()
 
 
-def get_all_subclasses(ni, res: list):
-    """Получение всех допустимых классов объектов"""
-    for node in ni.__subclasses__():
-        if isinstance(node.__init__, types.FunctionType):
-            res.append(node)
-        if len(node.__subclasses__()) > 0:
-            get_all_subclasses(node, res)
-    return res
+def load_task_modules(prefix):
+    """Импортирует модули узлов, связей и правил задачи при первом обращении к ней"""
+    return [importlib.import_module(f'{prefix}_{name}') for name in ['nodes', 'relations', 'rules']]
+
+
+def get_query_run():
+    """Метка запуска страницы для статистики запросов; частичные перезапуски секций
+    относятся к последнему полному запуску, секция видна по вызывающей функции"""
+    return f"{st.session_state.get('username')}#{st.session_state.get('query_run', 0)}"
+
+
+query_stats.set_run_provider(get_query_run)
+
+
+def get_query_stats_panel():
+    """Панель администратора: запросы к базе по запускам страницы, вызывающим функциям и текстам запросов"""
+    with st.expander('Запросы к базе'):
+        records = query_stats.get_records()
+        run = get_query_run()
+        run_records = query_stats.get_records(run)
+        st.caption(f'Текущий запуск: запросов {len(run_records)}, '
+                   f'{sum(r["time_ms"] for r in run_records):.0f} мс')
+        st.dataframe(pd.DataFrame(query_stats.group_records(run_records, 'caller')), hide_index=True)
+        st.caption('Все запросы по функциям')
+        st.dataframe(pd.DataFrame(query_stats.group_records(records, 'caller')), hide_index=True)
+        st.caption('Все запросы по текстам запросов')
+        st.dataframe(pd.DataFrame(query_stats.group_records(records, 'statement')), hide_index=True)
+        st.caption('По запускам страницы')
+        st.dataframe(pd.DataFrame(query_stats.group_records(records, 'run')), hide_index=True)
+        st.caption(f'Медленные запросы (от {query_stats.SLOW_QUERY_MS:.0f} мс)')
+        st.dataframe(pd.DataFrame(query_stats.get_slow_records()), hide_index=True)
+        st.download_button('Скачать журнал (JSON)', query_stats.dump_json(records),
+                           file_name='query_stats.json', mime='application/json')
+        if st.button('Очистить журнал'):
+            query_stats.clear()
+
+
+def begin_section(name):
+    """Вызывается в начале каждой секции-фрагмента. За полный запуск страницы секция выполняется один раз,
+    поэтому повторное выполнение — ее частичный перезапуск, который получает собственную метку запуска"""
+    started = st.session_state.setdefault('sections_run', set())
+    if name in started:
+        st.session_state['section_run'] = st.session_state.get('section_run', 0) + 1
+    started.add(name)
+
+
+def get_model_version(task_label, user_label):
+    """Версия модели в базе, прочитанная один раз за полный запуск страницы или частичный перезапуск секции"""
+    run = (st.session_state.get('query_run', 0), st.session_state.get('section_run', 0))
+    memo = st.session_state.get('model_versions')
+    if memo is None or memo[0] != run:
+        memo = st.session_state['model_versions'] = (run, {})
+    versions = memo[1]
+    if (task_label, user_label) not in versions:
+        versions[(task_label, user_label)] = model_version.get_version(conn, task_label, user_label)
+    return versions[(task_label, user_label)]
+
+
+def get_snapshot(task_label, user_label):
+    """Снимок модели, общий для всех секций страницы. Сверяется с версией модели в базе один раз за запуск
+    (в том числе частичный перезапуск секции) и перечитывается, если модель изменило приложение,
+    в том числе в другом процессе"""
+    snapshots = st.session_state.setdefault('model_snapshots', {})
+    # версия читается до снимка: запись между ними приведет к лишнему перечитыванию, но не к устаревшему снимку
+    version = get_model_version(task_label, user_label)
+    snapshot = snapshots.get((task_label, user_label))
+    if snapshot is None or snapshot.version != version:
+        snapshot = ModelSnapshot(conn, task_label, user_label, version)
+        snapshots[(task_label, user_label)] = snapshot
+    return snapshot
+
+
+def invalidate_snapshot(task_label, user_label):
+    """Сбрасывает снимок модели и прочитанную в этом запуске версию после записи в модель"""
+    st.session_state.setdefault('model_snapshots', {}).pop((task_label, user_label), None)
+    memo = st.session_state.get('model_versions')
+    if memo is not None:
+        memo[1].pop((task_label, user_label), None)
+
+
+def model_changed(task_label, user_label, section, message):
+    """После записи в модель перезапускает страницу целиком, чтобы обновились все зависящие от нее секции;
+    сообщение показывается в секции section после перезапуска"""
+    invalidate_snapshot(task_label, user_label)
+    st.session_state['model_message' + task_label] = (section, message)
+    st.rerun(scope='app')
+
+
+def show_model_message(task_label, section):
+    message = st.session_state.get('model_message' + task_label)
+    if message is not None and message[0] == section:
+        st.caption(message[1])
+        st.session_state.pop('model_message' + task_label)
 
 
 def get_text_input_value(lbl, values):
@@ -49,11 +187,11 @@ def get_text_input_value(lbl, values):
     values.append(v)
 
 
-def get_node_form(selected_ntype, node_types_avail, user_label, task_label):
+def get_node_form(selected_ntype, registry, user_label, task_label):
     """Отрисовка формы для добавления объекта"""
-    for node in node_types_avail:
+    for node in registry.classes:
         if node.__name__ == selected_ntype:
-            attrs = [i for i in node.__init__.__code__.co_varnames if i != 'self']
+            attrs = registry.fields[node]
             with st.form("add_node" + task_label, clear_on_submit=True):
                 attr_values = []
                 for attr in attrs:
@@ -66,49 +204,19 @@ def get_node_form(selected_ntype, node_types_avail, user_label, task_label):
                 if submitted:
                     n = node(*attr_values)
                     n.db_merge_node(conn)
-                    st.caption('Объект успешно создан')
+                    model_changed(task_label, user_label, 'node', 'Объект успешно создан')
 
 
 def get_items_by_type(node_type, task_label, user_label):
-    query = f"MATCH (a:{node_type}:{task_label}:{user_label}) RETURN a.name AS name"
-    db_nodes = conn.query(query)
-    if db_nodes is None:
-        return []
-    return [n["name"] for n in db_nodes]
+    return get_snapshot(task_label, user_label).get_names(node_type)
 
 
 def get_node_class_from_db_result(db_node, task_label, user_label, node_module):
     """Получает экземпляра класса Nodes из элемента результата выполнения запроса, возвращающего список узлов"""
-    nds = get_all_subclasses(node_module.NodeItem, [])
-    for node in nds:
-        for label in db_node.labels:
-            if label not in [user_label, task_label]:
-                if node.__name__ == label:
-                    attrs = [i for i in node.__init__.__code__.co_varnames if i != 'self']
-                    attr_values = []
-                    for attr in attrs:
-                        if attr == 'user_label':
-                            attr_values.append(user_label)
-                        else:
-                            # Проверяем, есть ли атрибут в узле, прежде чем его получить
-                            if attr in db_node:
-                                attr_values.append(db_node[attr])
-                            else:
-                                attr_values.append(None) # или другое значение по умолчанию
-                    return node(*attr_values)
-    return None
-
-
-def get_node_class(node_name, node_type, task_label, user_label, node_module):
-    """Получение экземпляра класса Nodes на основе его названия и типа"""
-    query = f'MATCH (a:{node_type}:{user_label}:{task_label} {{name: "{node_name}"}}) RETURN a'
-    db_nodes = conn.query(query)
-    if not db_nodes:
-        return None
-    return get_node_class_from_db_result(db_nodes[0]['a'], task_label, user_label, node_module)
+    return get_node_registry(node_module).decode(db_node, task_label, user_label)
 
 
-def get_relation_form(selected_rtype, rel_types_avail, task_label, user_label, node_module):
+def get_relation_form(selected_rtype, rel_types_avail, task_label, user_label):
     """Отрисовка формы для добавления связи"""
     for rel in rel_types_avail:
         if rel.__name__ == selected_rtype:
@@ -125,14 +233,12 @@ def get_relation_form(selected_rtype, rel_types_avail, task_label, user_label, n
                     submitted = st.form_submit_button("Создать")
                     if submitted:
                         if main_node_name and related_node_name:
-                            main_node = get_node_class(main_node_name, main_node_type,
-                                                       task_label, user_label, node_module)
-                            related_node = get_node_class(related_node_name, related_node_type,
-                                                          task_label, user_label, node_module)
-                            if main_node and related_node:
-                                r = rel(main_node, related_node)
-                                r.db_create_relation(conn)
-                                st.caption('Связь успешно создана')
+                            created = rel.db_create_relation_by_names(
+                                conn,
+                                [task_label, main_node_type, user_label], main_node_name,
+                                [task_label, related_node_type, user_label], related_node_name)
+                            if created:
+                                model_changed(task_label, user_label, 'relation', 'Связь успешно создана')
                             else:
                                 st.error("Не удалось найти один из объектов. Связь не создана.")
                         else:
@@ -148,42 +254,115 @@ def get_color_dict(n_types, colors, task_label):
     return res
 
 
+def get_node_type(db_node, task_label, user_label):
+    """Класс узла для раскраски и группировки (без меток задачи, пользователя и подклассов)"""
+    return next((l for l in db_node.labels
+                 if l not in [task_label, user_label, 'Robot', 'B2C',
+                              'View', 'Click', 'Scroll', 'Type', 'Button', 'Screen', 'Banner', 'Block']), None)
+
+
+def get_graph_node(db_node, color_dict, task_label, user_label):
+    n_label = get_node_type(db_node, task_label, user_label)
+    return Node(id=db_node.element_id,
+                title=str({i[0]: i[1] for i in db_node.items() if i[0] != 'name'}),
+                label=db_node['name'], size=25, color=color_dict.get(n_label, '#a2a2a2'))
+
+
+def get_neighbourhood(task_label, user_label, element_id=None, node_type=None, limit=MAX_GRAPH_ELEMENTS):
+    """Загружает из базы окрестность узла (по element_id) или узлы одного класса вместе с их связями;
+    всего возвращается не более limit узлов и связей"""
+    if element_id is not None:
+        query = f"MATCH (a:{task_label}:{user_label}) WHERE elementId(a) = $element_id "
+    else:
+        query = f"MATCH (a:{task_label}:{user_label}:{node_type}) "
+    query += f"WITH a LIMIT $limit " \
+             f"OPTIONAL MATCH (a)-[r]-(b:{task_label}:{user_label}) " \
+             f"RETURN a, r, b LIMIT $limit"
+    db_nodes = {}
+    db_rels = {}
+    with conn.stream(query, {'element_id': element_id, 'limit': limit}) as records:
+        for row in records:
+            new_nodes = {n.element_id: n for n in (row['a'], row['b'])
+                         if n is not None and n.element_id not in db_nodes}
+            new_rel = row['r'] is not None and row['r'].element_id not in db_rels
+            # связь добавляется только вместе с обоими концами, чтобы граф не ссылался на отсутствующие узлы
+            if len(db_nodes) + len(db_rels) + len(new_nodes) + new_rel > limit:
+                break
+            db_nodes.update(new_nodes)
+            if new_rel:
+                db_rels[row['r'].element_id] = row['r']
+    return list(db_nodes.values()), list(db_rels.values())
+
+
+def get_cluster_graph(snapshot, color_dict, task_label, user_label):
+    """Обзор большой модели: узлы одного класса свернуты в группу с количеством объектов"""
+    node_types = {n.element_id: get_node_type(n, task_label, user_label) for n in snapshot.get_nodes()}
+    node_counts = Counter(node_types.values())
+    edge_counts = Counter((node_types.get(s.element_id), r['name'], node_types.get(t.element_id))
+                          for s, r, t in snapshot.get_relations())
+
+    nodes = [Node(id=f'cluster:{n_type}', title=f'{n_type}: {count}', label=f'{n_type} ({count})',
+                  size=25 + min(count, 50) // 2, color=color_dict.get(n_type, '#a2a2a2'))
+             for n_type, count in node_counts.items()]
+    edges = [Edge(source=f'cluster:{s}', label=f'{name} ({count})', target=f'cluster:{t}')
+             for (s, name, t), count in edge_counts.items()]
+    return nodes, edges
+
+
+@st.fragment
 def get_graph(task_label, user_label):
+    """Граф модели; переход между обзором и окрестностями перерисовывает только эту секцию"""
+    begin_section('graph')
     nodes = []
     edges = []
 
-    query_nodes = f'MATCH (a:{task_label}:{user_label}) RETURN a'
-    db_nodes = conn.query(query_nodes)
-
-    if db_nodes is None:
-        st.warning("Не удалось получить данные для графа.")
-        return
+    snapshot = get_snapshot(task_label, user_label)
+    db_nodes = snapshot.get_nodes()
 
     colors = ['#f6511d', '#ffb400', '#00a6ed', '#7fb800', '#0d2c54', '#a2a2a2', '#8E44AD'] # Добавлен новый цвет
 
     node_types = []
     for db_node in db_nodes:
-        n_labels = db_node['a'].labels
+        n_labels = db_node.labels
         for label in n_labels:
             if label not in [task_label, user_label, 'Robot', 'B2C'] and label not in node_types:
                 node_types.append(label)
 
     color_dict = get_color_dict(node_types, colors, task_label)
-    for db_node in db_nodes:
-        n_label = [l for l in db_node['a'].labels
-                   if l not in [task_label, user_label, 'Robot', 'B2C',
-                                'View', 'Click', 'Scroll', 'Type', 'Button', 'Screen', 'Banner', 'Block']][0]
-        nodes.append(Node(id=db_node['a'].element_id,
-                          title=str({i[0]: i[1] for i in db_node['a'].items() if i[0] != 'name'}),
-                          label=db_node['a']['name'], size=25, color=color_dict.get(n_label, '#a2a2a2')))
-
-    query_rels = f'MATCH (s:{task_label}:{user_label})-[r]->(t:{task_label}:{user_label}) RETURN r, s, t'
-    db_rels = conn.query(query_rels)
-    if db_rels:
-        for db_rel in db_rels:
-            edges.append(Edge(source=db_rel['s'].element_id,
-                              label=db_rel['r']['name'],
-                              target=db_rel['t'].element_id))
+
+    # Большие модели показываются по уровням детализации: обзор по классам и раскрытие окрестности по щелчку
+    focus_key = 'graph_focus' + task_label
+    focus = st.session_state.get(focus_key)
+    scalable = len(db_nodes) + len(snapshot.get_relations()) > MAX_GRAPH_ELEMENTS
+    if focus is not None:
+        if st.button('Вернуться к обзору модели', key='graph_overview' + task_label):
+            st.session_state.pop(focus_key)
+            # повторный щелчок по той же группе снова раскрывает ее
+            st.session_state.pop('graph_clicked' + task_label, None)
+            st.rerun(scope='fragment')
+        if focus.startswith('cluster:'):
+            focus_nodes, focus_rels = get_neighbourhood(task_label, user_label, node_type=focus[len('cluster:'):])
+        else:
+            focus_nodes, focus_rels = get_neighbourhood(task_label, user_label, element_id=focus)
+        nodes = [get_graph_node(n, color_dict, task_label, user_label) for n in focus_nodes]
+        edges = [Edge(source=r.start_node.element_id, label=r['name'], target=r.end_node.element_id)
+                 for r in focus_rels]
+    elif scalable:
+        st.caption('Модель большая, поэтому объекты сгруппированы по классам. '
+                   'Нажмите на группу или объект, чтобы раскрыть его окрестность.')
+        nodes, edges = get_cluster_graph(snapshot, color_dict, task_label, user_label)
+    else:
+        for db_node in db_nodes:
+            nodes.append(get_graph_node(db_node, color_dict, task_label, user_label))
+
+        for source, db_rel, target in snapshot.get_relations():
+            edges.append(Edge(source=source.element_id,
+                              label=db_rel['name'],
+                              target=target.element_id))
+
+    # координаты рассчитываются на сервере и кэшируются, браузер не выполняет раскладку
+    positions = graph_layout.get_layout(task_label, user_label, snapshot.version, nodes, edges)
+    graph_layout.apply_layout(nodes, positions)
 
     graph_config = Config(width=750,
                           height=500,
@@ -195,54 +374,148 @@ def get_graph(task_label, user_label):
                           key=task_label
                           )
 
-    return agraph(nodes=nodes, edges=edges, config=graph_config)
+    selected = agraph(nodes=nodes, edges=edges, config=graph_config)
+    # значение компонента сохраняется между перезапусками, поэтому реагируем только на новый щелчок
+    if (scalable or focus is not None) and selected and selected != st.session_state.get('graph_clicked' + task_label):
+        st.session_state['graph_clicked' + task_label] = selected
+        st.session_state[focus_key] = selected
+        st.rerun(scope='fragment')
+    st.session_state['graph_clicked' + task_label] = selected
+    return selected
 
 
 def get_relation_class_from_db_result(db_relation, source_node, target_node, relation_module):
-    rels = get_all_subclasses(relation_module.RelationItem, [])
-    for rel in rels:
-        if rel.rel_name == db_relation['name']:
-            return rel(source_node, target_node)
-    return None
+    return get_relation_registry(relation_module).decode(db_relation, source_node, target_node)
 
 
 def get_relations_from_db(user_label, task_label, node_module, relation_module):
-    result = conn.query(f"MATCH (s:{user_label}:{task_label})-[r]->(t:{user_label}:{task_label}) RETURN s,t,r")
-    if not result:
-        return []
     rels_list = []
-    for relation in result:
-        source_node = get_node_class_from_db_result(relation['s'], task_label, user_label, node_module)
-        target_node = get_node_class_from_db_result(relation['t'], task_label, user_label, node_module)
-        relation = get_relation_class_from_db_result(relation['r'], source_node, target_node, relation_module)
+    for source, db_rel, target in get_snapshot(task_label, user_label).get_relations():
+        source_node = get_node_class_from_db_result(source, task_label, user_label, node_module)
+        target_node = get_node_class_from_db_result(target, task_label, user_label, node_module)
+        relation = get_relation_class_from_db_result(db_rel, source_node, target_node, relation_module)
         if all([source_node, target_node, relation]):
             rels_list.append((source_node, target_node, relation))
     return rels_list
 
 
+def get_import_export_form(task_label, user_label, node_module, relations_module):
+    """Выгрузка модели в JSONL/CSV и загрузка модели из файла"""
+    fmt = st.radio("Формат", ['jsonl', 'csv'], horizontal=True, key="io_format"+task_label)
+    # выгрузка формируется только по нажатию кнопки и не хранится в состоянии сессии
+    st.download_button("Скачать модель",
+                       lambda: ''.join(model_io.export_model(conn, task_label, user_label,
+                                                             node_module, relations_module, fmt)),
+                       file_name=f"{task_label}_{user_label}.{fmt}", mime='text/plain',
+                       on_click='ignore', key="download_btn"+task_label)
+
+    uploaded = st.file_uploader("Файл модели", type=['jsonl', 'csv'], key="import_file"+task_label)
+    if uploaded is not None and st.button("Загрузить модель", key="import_btn"+task_label):
+        import_fmt = 'csv' if uploaded.name.endswith('.csv') else 'jsonl'
+        stats = model_io.import_model(conn, io.TextIOWrapper(uploaded, encoding='utf-8', newline=''), user_label,
+                                      node_module, relations_module, import_fmt)
+        invalidate_snapshot(task_label, user_label)
+        st.caption(f"Создано объектов: {stats['nodes_created']}, связей: {stats['relationships_created']}")
+        for error in stats['errors']:
+            st.warning(f"Запись {error}")
+
+
+@st.fragment
+def get_node_creation(task_label, user_label, node_module):
+    """Секция создания объектов: выбор класса и ввод полей перерисовывают только ее"""
+    begin_section('node_creation')
+    show_model_message(task_label, 'node')
+    node_registry = get_node_registry(node_module)
+
+    node_dict = {}
+    for i in node_registry.classes:
+        node_dict[i.__name__] = i.class_name
+    selected_node_label = st.selectbox("Класс объекта", node_dict.values())
+    selected_node_type = [i for i in node_dict if node_dict[i] == selected_node_label][0]
+    get_node_form(selected_node_type, node_registry, user_label, task_label)
+
+
+@st.fragment
+def get_relation_creation(task_label, user_label, relations_module):
+    """Секция создания связей"""
+    begin_section('relation_creation')
+    show_model_message(task_label, 'relation')
+    rel_types = get_relation_registry(relations_module).classes
+    rel_dict = {}
+    for i in rel_types:
+        rel_dict[i.__name__] = i.rel_name
+    selected_rel_label = st.selectbox("Тип связи", rel_dict.values())
+    selected_rel_type = [i for i in rel_dict if rel_dict[i] == selected_rel_label][0]
+    get_relation_form(selected_rel_type, rel_types, task_label, user_label)
+
+
+@st.fragment
+def get_deletion(task_label, user_label, node_module, relations_module):
+    """Секция удаления объектов, связей и модели"""
+    begin_section('deletion')
+    st.subheader('Удаление объектов')
+    all_nodes_db = get_snapshot(task_label, user_label).get_nodes()
+    if not all_nodes_db:
+        st.text("В модели пока нет объектов.")
+    else:
+        node_registry = get_node_registry(node_module)
+        all_nodes = [n for n in (node_registry.decode(i, task_label, user_label) for i in all_nodes_db)
+                     if n is not None]
+        if all_nodes:
+            all_nodes_df = pd.DataFrame()
+            all_nodes_df['name'] = [i.name for i in all_nodes]
+            all_nodes_df['node'] = all_nodes
+            selected_node_name_for_removal = st.selectbox("Объект", all_nodes_df['name'], key="delete_node_select")
+            if selected_node_name_for_removal:
+                selected_node_index = all_nodes_df[all_nodes_df['name'] == selected_node_name_for_removal].index[0]
+                del_object_btn = st.button("Удалить объект", key="delete_node"+task_label)
+                if del_object_btn:
+                    all_nodes_df.loc[selected_node_index]['node'].db_delete_node(conn)
+                    model_changed(task_label, user_label, 'delete', 'Объект удален')
+
+    st.subheader('Удаление связи')
+    all_relations = get_relations_from_db(user_label, task_label, node_module, relations_module)
+    if len(all_relations) == 0:
+        st.text("В модели пока нет связей.")
+    else:
+        all_rels_df = pd.DataFrame()
+        all_rels_df['name'] = [f"{s.name} -> {r.rel_name} -> {t.name}" for s, t, r in all_relations]
+        all_rels_df['relation'] = [r for _, _, r in all_relations]
+        selected_rel_for_removal = st.selectbox("Связь", all_rels_df['name'], key="delete_rel_select")
+        if selected_rel_for_removal:
+            selected_rel_index = all_rels_df[all_rels_df['name'] == selected_rel_for_removal].index[0]
+            del_rel_btn = st.button("Удалить связь", key="delete_relation"+task_label)
+            if del_rel_btn:
+                all_rels_df.loc[selected_rel_index]['relation'].db_delete_relation(conn)
+                model_changed(task_label, user_label, 'delete', 'Связь удалена')
+
+    st.subheader('Удаление модели')
+    del_btn = st.button("Удалить модель", key="delete_model"+task_label)
+    if del_btn:
+        progress_bar = st.progress(0.0, text='Удаление модели...')
+
+        def show_progress(deleted, total):
+            progress_bar.progress(min(deleted / total, 1.0) if total else 1.0,
+                                  text=f'Удалено элементов: {deleted} из {total}')
+
+        model_cleanup.delete_model(conn, task_label, user_label, progress=show_progress)
+        model_changed(task_label, user_label, 'delete', 'Модель удалена')
+    show_model_message(task_label, 'delete')
+
+
 def get_task_content(task_label, user_label, title, node_module, relations_module, rules_module):
     st.title(title)
     if user_label != 'demo':
         st.header('Создание модели')
 
         st.subheader('Создание объектов')
-        node_types = get_all_subclasses(node_module.NodeItem, [])
-
-        node_dict = {}
-        for i in node_types:
-            node_dict[i.__name__] = i.class_name
-        selected_node_label = st.selectbox("Класс объекта", node_dict.values())
-        selected_node_type = [i for i in node_dict if node_dict[i] == selected_node_label][0]
-        get_node_form(selected_node_type, node_types, user_label, task_label)
+        get_node_creation(task_label, user_label, node_module)
 
         st.subheader('Создание связей')
-        rel_types = get_all_subclasses(relations_module.RelationItem, [])
-        rel_dict = {}
-        for i in rel_types:
-            rel_dict[i.__name__] = i.rel_name
-        selected_rel_label = st.selectbox("Тип связи", rel_dict.values())
-        selected_rel_type = [i for i in rel_dict if rel_dict[i] == selected_rel_label][0]
-        get_relation_form(selected_rel_type, rel_types, task_label, user_label, node_module)
+        get_relation_creation(task_label, user_label, relations_module)
+
+        st.subheader('Импорт и экспорт модели')
+        get_import_export_form(task_label, user_label, node_module, relations_module)
         st.divider()
 
     st.header('Визуализация модели')
@@ -256,56 +529,22 @@ def get_task_content(task_label, user_label, title, node_module, relations_modul
         st.caption(row['desc'])
 
     if user_label != 'demo':
+        full_run = st.checkbox("Полный прогон (по всей модели, а не только по изменениям)", key="full_rules"+task_label)
         rules_btn = st.button("Запустить правила", key="trigger_rules"+task_label)
         if rules_btn:
-            for _, row in rules_df.iterrows():
-                if not row['code'] is None:
-                    conn.query(row['code'])
-            st.caption('Правила успешно выполнены')
+            st.session_state['rules_stats'+task_label] = rule_engine.run_rules(conn, rules_df, task_label, user_label,
+                                                                              full=full_run)
+            invalidate_snapshot(task_label, user_label)
             st.rerun()
+        if 'rules_stats'+task_label in st.session_state:
+            stats_df, iterations, mode = st.session_state['rules_stats'+task_label]
+            mode_name = 'по изменениям' if mode == 'incremental' else 'полный'
+            st.caption(f'Правила успешно выполнены (режим: {mode_name}, проходов: {iterations})')
+            st.dataframe(stats_df, hide_index=True)
         st.divider()
 
         st.header('Удаление')
-
-        st.subheader('Удаление объектов')
-        all_nodes_db = conn.query(f"MATCH (a:{task_label}:{user_label}) RETURN a")
-        if not all_nodes_db:
-            st.text("В модели пока нет объектов.")
-        else:
-            all_nodes = [get_node_class_from_db_result(i['a'], task_label, user_label, node_module) for i in all_nodes_db if get_node_class_from_db_result(i['a'], task_label, user_label, node_module) is not None]
-            if all_nodes:
-                all_nodes_df = pd.DataFrame()
-                all_nodes_df['name'] = [i.name for i in all_nodes]
-                all_nodes_df['node'] = all_nodes
-                selected_node_name_for_removal = st.selectbox("Объект", all_nodes_df['name'], key="delete_node_select")
-                if selected_node_name_for_removal:
-                    selected_node_index = all_nodes_df[all_nodes_df['name'] == selected_node_name_for_removal].index[0]
-                    del_object_btn = st.button("Удалить объект", key="delete_node"+task_label)
-                    if del_object_btn:
-                        all_nodes_df.loc[selected_node_index]['node'].db_delete_node(conn)
-                        st.rerun()
-
-        st.subheader('Удаление связи')
-        all_relations = get_relations_from_db(user_label, task_label, node_module, relations_module)
-        if len(all_relations) == 0:
-            st.text("В модели пока нет связей.")
-        else:
-            all_rels_df = pd.DataFrame()
-            all_rels_df['name'] = [f"{s.name} -> {r.rel_name} -> {t.name}" for s, t, r in all_relations]
-            all_rels_df['relation'] = [r for _, _, r in all_relations]
-            selected_rel_for_removal = st.selectbox("Связь", all_rels_df['name'], key="delete_rel_select")
-            if selected_rel_for_removal:
-                selected_rel_index = all_rels_df[all_rels_df['name'] == selected_rel_for_removal].index[0]
-                del_rel_btn = st.button("Удалить связь", key="delete_relation"+task_label)
-                if del_rel_btn:
-                    all_rels_df.loc[selected_rel_index]['relation'].db_delete_relation(conn)
-                    st.rerun()
-
-        st.subheader('Удаление модели')
-        del_btn = st.button("Удалить модель", key="delete_model"+task_label)
-        if del_btn:
-            conn.query(f"MATCH (n:{task_label}:{user_label}) DETACH DELETE n")
-            st.rerun()
+        get_deletion(task_label, user_label, node_module, relations_module)
 
 
 if __name__ == '__main__':
@@ -329,12 +568,20 @@ if __name__ == '__main__':
     name, authentication_status, username = authenticator.login()
 
     if st.session_state["authentication_status"]:
+        st.session_state['query_run'] = st.session_state.get('query_run', 0) + 1
+        st.session_state['sections_run'] = set()
         with st.sidebar:
             st.write(f'Добро пожаловать, *{st.session_state["name"]}*')
             authenticator.logout('Выйти')
 
-        tab1, tab2 = st.tabs(["Робот", "B2C"])
-        with tab1:
+        # Отрисовывается только выбранная задача, модули другой задачи не загружаются
+        task_name = st.radio("Задача", list(TASKS), horizontal=True, key='active_task', label_visibility='collapsed')
+        task = TASKS[task_name]
+        node_module, relations_module, rules_module = load_task_modules(task['prefix'])
+        # Индексы по (метка, name, codename) создаются один раз на процесс, существующие пропускаются
+        schema_manager.ensure_indexes(conn, [node_module])
+
+        if task['task_label'] == 'Robot':
             with st.expander("Варианты заданий"):
                 if os.path.exists("robot_variants.png"):
                     st.image("robot_variants.png", width=300)
@@ -342,15 +589,16 @@ if __name__ == '__main__':
                     with open("robot_description.md", mode='r') as f:
                         st.markdown(f.read())
 
-            get_task_content('Robot', username, 'Моделирование траектории робота',
-                             node_module=robot_nodes, relations_module=robot_relations, rules_module=robot_rules)
+            get_task_content('Robot', username, task['title'],
+                             node_module=node_module, relations_module=relations_module, rules_module=rules_module)
             st.divider()
             st.header("Генерация кода на основе модели")
             generate_btn = st.button("Сгенерировать код", key='generate_code_robot')
             if generate_btn:
-                st.code(get_template(conn, username), language='python')
+                from robot_generator_turtle import get_template
+                st.code(get_template(get_read_connection(), username), language='python')
 
-        with tab2:
+        else:
             with st.expander("Варианты заданий"):
                 if os.path.exists("b2c_description.md"):
                     with open("b2c_description.md", mode='r') as f:
@@ -358,14 +606,20 @@ if __name__ == '__main__':
                 if os.path.exists("b2c_example.jpg"):
                     st.image("b2c_example.jpg")
 
-            get_task_content('B2C', username, 'Аналитика пользовательского поведения в B2C-сервисе',
-                             node_module=b2c_nodes, relations_module=b2c_relations, rules_module=b2c_rules)
+            get_task_content('B2C', username, task['title'],
+                             node_module=node_module, relations_module=relations_module, rules_module=rules_module)
             st.divider()
             st.header("Генерация документации на основе модели")
             generate_b2c_btn = st.button("Сгенерировать документацию", key='generate_b2c')
             if generate_b2c_btn:
+                from b2c_generator import get_events
                 st.markdown(get_events(conn, username))
 
+        # панель выводится в конце, чтобы учесть все запросы текущего запуска
+        if username in ADMIN_USERS:
+            with st.sidebar:
+                get_query_stats_panel()
+
     elif st.session_state["authentication_status"] is False:
         st.error('Имя пользователя или пароль неверны')
     elif st.session_state["authentication_status"] is None:
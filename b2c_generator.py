@@ -1,32 +1,73 @@
+import model_version
+
+
 def get_screens(conn, user_label):
     """Получает все доступные состояния"""
     query = f"MATCH (s:Screen:{user_label}) RETURN s"
-    res = conn.query(query)
+    res = conn.read_query(query)
     return [r['s']['name'] for r in res]
 
 
 def get_events_for_screen(conn, user_label, screen):
     """Получает все доступные состояния"""
     query_1 = f'MATCH (a:Action:{user_label})-[{{name: "вызывать"}}]-(event:Event:{user_label}) ' \
-              f'MATCH (a)-[{{name: "предполагать взаимодействие с"}}]->(s:Screen:{user_label} {{name: "{screen}"}}) ' \
+              f'MATCH (a)-[{{name: "предполагать взаимодействие с"}}]->(s:Screen:{user_label} {{name: $screen}}) ' \
               f'RETURN event'
 
     query_2 = f'MATCH (a:Action:{user_label})-[{{name: "вызывать"}}]-(event:Event:{user_label}) ' \
               f'MATCH (a)-[{{name: "предполагать взаимодействие с"}}]->(i:Interface:{user_label})' \
-              f'-[{{name: "являться частью"}}]->(s:Screen:{user_label} {{name: "{screen}"}}) ' \
+              f'-[{{name: "являться частью"}}]->(s:Screen:{user_label} {{name: $screen}}) ' \
               f'RETURN event'
 
     res_str = f"**{screen}**:\n"
 
     for q in [query_1, query_2]:
-        res = conn.query(q)
+        res = conn.read_query(q, {'screen': screen})
         for r in res:
             res_str += f"- **{r['event']['name']}** – {r['event']['description']}\n"
     res_str += '\n'
     return res_str
 
 
-def get_events(conn, user_label):
+def get_screen_events(conn, user_label):
+    """Получает события всех экранов одним запросом: сначала прямые, затем через вложенные элементы.
+    Пары (экран, события) читаются из базы по мере обработки"""
+    query = f'MATCH (s:Screen:{user_label}) ' \
+            f'CALL {{ ' \
+            f'WITH s ' \
+            f'MATCH (a:Action:{user_label})-[{{name: "вызывать"}}]-(event:Event:{user_label}) ' \
+            f'MATCH (a)-[{{name: "предполагать взаимодействие с"}}]->(s) ' \
+            f'RETURN collect(event {{.name, .description}}) AS direct ' \
+            f'}} ' \
+            f'CALL {{ ' \
+            f'WITH s ' \
+            f'MATCH (a:Action:{user_label})-[{{name: "вызывать"}}]-(event:Event:{user_label}) ' \
+            f'MATCH (a)-[{{name: "предполагать взаимодействие с"}}]->(i:Interface:{user_label})' \
+            f'-[{{name: "являться частью"}}]->(s) ' \
+            f'RETURN collect(event {{.name, .description}}) AS nested ' \
+            f'}} ' \
+            f'RETURN s.name AS screen, direct + nested AS events'
+    with conn.stream(query) as records:
+        for r in records:
+            yield r['screen'], r['events']
+
+
+def render_events(screen_events):
+    """Формирует документацию по списку пар (экран, события) за один проход"""
+    lines = []
+    for screen, events in screen_events:
+        lines.append(f"**{screen}**:\n")
+        for event in events:
+            lines.append(f"- **{event['name']}** – {event['description']}\n")
+        lines.append('\n')
+    return ''.join(lines)
+
+
+@model_version.cached_artifact('B2C')
+def get_events(conn, user_label, grouped=True):
+    """Документация по событиям; grouped=False — прежний режим с отдельными запросами для каждого экрана"""
+    if grouped:
+        return render_events(get_screen_events(conn, user_label))
     screens = get_screens(conn, user_label)
     res_str = ""
     for screen in screens:
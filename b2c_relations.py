@@ -1,4 +1,5 @@
 from b2c_nodes import *
+import model_version
 
 
 class RelationItem:
@@ -22,21 +23,43 @@ class RelationItem:
             raise RuntimeError("You can not use {}-{} source-target combination in a relation of type {}".format(
                 type(self.source).__name__, type(self.target).__name__, type(self).__name__))
 
+    @staticmethod
+    def get_match_subquery(source_labels, target_labels):
+        """Сопоставление концов связи по меткам и имени (без предварительного поиска идентификаторов)"""
+        return f"MATCH (source:{':'.join(source_labels)} {{name: $source_name}}), " \
+               f"(target:{':'.join(target_labels)} {{name: $target_name}}) "
+
+    @classmethod
+    def db_create_relation_by_names(cls, connection, source_labels, source_name, target_labels, target_name):
+        """Создает связь одним запросом; возвращает количество найденных пар объектов"""
+        query = cls.get_match_subquery(source_labels, target_labels) + \
+            "MERGE (source)-[:SEMANTIC {name: $rel_name}]->(target) " \
+            "RETURN count(*) AS count"
+        result = connection.write_query(query, {'source_name': source_name, 'target_name': target_name,
+                                                'rel_name': cls.rel_name},
+                                        model=model_version.model_key(source_labels),
+                                        touched=[source_name, target_name])
+        return result[0]['count']
+
+    @classmethod
+    def db_delete_relation_by_names(cls, connection, source_labels, source_name, target_labels, target_name):
+        """Удаляет связь одним запросом; возвращает количество удаленных связей"""
+        query = cls.get_match_subquery(source_labels, target_labels) + \
+            "MATCH (source)-[r:SEMANTIC {name: $rel_name}]->(target) " \
+            "DELETE r " \
+            "RETURN count(r) AS count"
+        result = connection.write_query(query, {'source_name': source_name, 'target_name': target_name,
+                                                'rel_name': cls.rel_name},
+                                        model=model_version.model_key(source_labels))
+        return result[0]['count']
+
     def db_create_relation(self, connection):
-        source_id = self.source.get_node_id(connection)
-        target_id = self.target.get_node_id(connection)
-        query = f"MATCH (source), (target) " \
-                f"WHERE ID(source) = {source_id} AND ID(target) = {target_id} " \
-                f"MERGE (source)-[:SEMANTIC {{name: '{self.rel_name}'}}]->(target)"
-        connection.query(query)
+        return self.db_create_relation_by_names(connection, self.source.labels, self.source.name,
+                                                self.target.labels, self.target.name)
 
     def db_delete_relation(self, connection):
-        source_id = self.source.get_node_id(connection)
-        target_id = self.target.get_node_id(connection)
-        query = f"MATCH (source)-[r:SEMANTIC {{name: '{self.rel_name}'}}]->(target) " \
-                f"WHERE ID(source) = {source_id} AND ID(target) = {target_id} " \
-                f"DELETE r"
-        connection.query(query)
+        return self.db_delete_relation_by_names(connection, self.source.labels, self.source.name,
+                                                self.target.labels, self.target.name)
 
 
 class HaveState(RelationItem):
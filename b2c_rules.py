@@ -2,6 +2,7 @@ import pandas as pd
 
 
 def create_rules(user_label, task_label):
+    """Правила задачи: описание, полный запрос и запрос по изменениям (delta_code, см. robot_rules)"""
     rules = []
 
 #     rules.append((
@@ -15,14 +16,7 @@ def create_rules(user_label, task_label):
 # MERGE (a1)-[:SEMANTIC {name: 'предшествовать'}]->(a2)"""
 #     ))
 
-    rules.append((
-        "Если действие a предполагает взаимодействие с элементом интерфейса i, "
-        "а также элемент интерфейса i является частью другого элемента интерфейса i_p, то "
-        "необходимо создать событие, связанное с действием a отношением «вызывать», "
-        "название которого будет формироваться на основе свойств codename элементов интерфейса i и i_p, "
-        "а также подтипа действия a.",
-        f"""MATCH (a:{task_label}:{user_label}:Action)-[{{name: 'предполагать взаимодействие с'}}]->(i:{task_label}:{user_label}:Interface)
-OPTIONAL MATCH (i:{task_label}:{user_label}:Interface)-[{{name: 'являться частью'}}]->(i_p:{task_label}:{user_label}:Interface)
+    event_body = f"""OPTIONAL MATCH (i:{task_label}:{user_label}:Interface)-[{{name: 'являться частью'}}]->(i_p:{task_label}:{user_label}:Interface)
 UNWIND labels(a) AS a_lbls
 UNWIND labels(i) AS i_lbls
 WITH DISTINCT a, 
@@ -37,6 +31,24 @@ WITH DISTINCT a,
         ELSE i_p.codename + "_" END AS i_p_codename
 WHERE act_type <> '' AND i_type <> ''
 MERGE (a)-[:SEMANTIC {{name: "вызывать"}}]->(i:{task_label}:{user_label}:Event {{name: i_p_codename + i_codename + "_" + act_type, description: act_name}})"""
+    interact = f"""(a:{task_label}:{user_label}:Action)-[{{name: 'предполагать взаимодействие с'}}]->(i:{task_label}:{user_label}:Interface)"""
+    rules.append((
+        "Если действие a предполагает взаимодействие с элементом интерфейса i, "
+        "а также элемент интерфейса i является частью другого элемента интерфейса i_p, то "
+        "необходимо создать событие, связанное с действием a отношением «вызывать», "
+        "название которого будет формироваться на основе свойств codename элементов интерфейса i и i_p, "
+        "а также подтипа действия a.",
+        f"""MATCH {interact}
+""" + event_body,
+        f"""CALL {{
+MATCH {interact} WHERE a.name IN $touched RETURN a, i
+UNION
+MATCH {interact} WHERE i.name IN $touched RETURN a, i
+UNION
+MATCH {interact}-[{{name: 'являться частью'}}]->(i_p:{task_label}:{user_label}:Interface) WHERE i_p.name IN $touched RETURN a, i
+}}
+""" + event_body + """
+RETURN [a.name, i.name] AS touched"""
     ))
 
-    return pd.DataFrame(rules, columns=['desc', 'code'])
+    return pd.DataFrame(rules, columns=['desc', 'code', 'delta_code'])
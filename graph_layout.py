@@ -0,0 +1,62 @@
+import json
+import threading
+from collections import OrderedDict
+
+import graphviz
+
+import query_stats
+
+# dot — иерархическая раскладка для автомата, sfdp — силовая для сети объектов B2C
+LAYOUT_ENGINES = {'Robot': 'dot', 'B2C': 'sfdp'}
+LAYOUT_CACHE_SIZE = 64
+
+_lock = threading.Lock()
+_layouts = OrderedDict()
+
+
+def compute_layout(nodes, edges, engine='dot'):
+    """Координаты узлов {id: (x, y)}, рассчитанные graphviz на сервере"""
+    names = {node.id: f'n{i}' for i, node in enumerate(nodes)}
+    graph = graphviz.Digraph(engine=engine, graph_attr={'overlap': 'false'})
+    for node in nodes:
+        graph.node(names[node.id], label=str(node.label or ''))
+    for edge in edges:
+        if edge.source in names and edge.to in names:
+            graph.edge(names[edge.source], names[edge.to], label=str(getattr(edge, 'label', '') or ''))
+
+    ids = {name: node_id for node_id, name in names.items()}
+    positions = {}
+    for obj in json.loads(graph.pipe(format='json')).get('objects', []):
+        if obj.get('name') in ids and 'pos' in obj:
+            x, y = obj['pos'].split(',')
+            # в graphviz ось y направлена вверх, на холсте vis.js — вниз
+            positions[ids[obj['name']]] = (float(x), -float(y))
+    return positions
+
+
+def get_layout(task_label, user_label, version, nodes, edges):
+    """Раскладка, кэшированная по модели, ее версии и набору отображаемых элементов"""
+    key = (task_label, user_label, version,
+           tuple(node.id for node in nodes), tuple((edge.source, edge.to) for edge in edges))
+    with _lock:
+        if key in _layouts:
+            _layouts.move_to_end(key)
+            return _layouts[key]
+    try:
+        positions = compute_layout(nodes, edges, LAYOUT_ENGINES.get(task_label, 'dot'))
+    except (graphviz.ExecutableNotFound, graphviz.CalledProcessError, ValueError) as e:
+        query_stats.logger.warning("Graph layout failed: %s", e)
+        positions = {}
+    with _lock:
+        _layouts[key] = positions
+        while len(_layouts) > LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    return positions
+
+
+def apply_layout(nodes, positions):
+    """Передает координаты узлов в agraph; узлы без координат раскладывает браузер"""
+    for node in nodes:
+        if node.id in positions:
+            node.x, node.y = positions[node.id]
+    return nodes
@@ -0,0 +1,42 @@
+DELETE_BATCH_SIZE = 1000
+
+
+def delete_batch(tx, query, batch_size):
+    return tx.run(query, batch_size=batch_size).consume()
+
+
+def delete_in_batches(connection, query, batch_size, deleted, total, progress, model):
+    """Повторяет удаляющий запрос отдельными транзакциями, пока он что-то удаляет;
+    версия модели увеличивается в каждой транзакции, которая что-то удалила"""
+    while True:
+        counters = connection.execute_write(delete_batch, query, batch_size, model=model).counters
+        batch = counters.nodes_deleted + counters.relationships_deleted
+        deleted += batch
+        if progress is not None:
+            progress(deleted, total)
+        if batch < batch_size:
+            return deleted
+
+
+def delete_model(connection, task_label, user_label, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Удаляет модель порциями: сначала связи, затем узлы, каждая порция — в отдельной транзакции.
+    progress(deleted, total) вызывается после каждой порции; возвращает количество удаленных элементов"""
+    res = connection.read_query(f"MATCH (n:{task_label}:{user_label}) "
+                                f"RETURN count(n) + sum(size([(n)-[r]->() | r])) AS total")
+    total = res[0]['total']
+    rels_query = f"MATCH (:{task_label}:{user_label})-[r]->() WITH r LIMIT $batch_size DELETE r"
+    nodes_query = f"MATCH (n:{task_label}:{user_label}) WITH n LIMIT $batch_size DETACH DELETE n"
+    model = (task_label, user_label)
+    deleted = delete_in_batches(connection, rels_query, batch_size, 0, total, progress, model)
+    return delete_in_batches(connection, nodes_query, batch_size, deleted, total, progress, model)
+
+
+def delete_cohort(connection, task_label, user_labels, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Удаляет модели группы пользователей (например, в конце семестра); progress(user_label, deleted, total)"""
+    res = {}
+    for user_label in user_labels:
+        user_progress = None
+        if progress is not None:
+            user_progress = lambda deleted, total, u=user_label: progress(u, deleted, total)
+        res[user_label] = delete_model(connection, task_label, user_label, batch_size, user_progress)
+    return res
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import re
+
+from model_registry import get_node_registry, get_relation_registry
+from neo4j_db_connector import BATCH_CHUNK_SIZE
+
+EXPORT_FETCH_SIZE = 1000
+CSV_COLUMNS = ['kind', 'class', 'name', 'codename', 'properties',
+               'source_class', 'source_name', 'target_class', 'target_name']
+
+
+def iter_model_records(connection, task_label, user_label, node_module, relation_module):
+    """Записи модели: сначала все узлы, затем связи между ними"""
+    node_registry = get_node_registry(node_module)
+    relation_registry = get_relation_registry(relation_module)
+
+    nodes_query = f"MATCH (a:{task_label}:{user_label}) RETURN a"
+    with connection.stream(nodes_query, fetch_size=EXPORT_FETCH_SIZE) as records:
+        for row in records:
+            node = node_registry.decode(row['a'], task_label, user_label)
+            if node is None:
+                continue
+            fields = node_registry.fields[type(node)]
+            record = {'kind': 'node', 'class': type(node).__name__}
+            for field in fields:
+                if field != 'user_label':
+                    record[field] = getattr(node, field)
+            # свойства, которых нет в конструкторе (например, description событий, созданных правилами)
+            properties = {key: value for key, value in row['a'].items() if key not in fields}
+            if properties:
+                record['properties'] = properties
+            yield record
+
+    rels_query = f"MATCH (s:{task_label}:{user_label})-[r]->(t:{task_label}:{user_label}) RETURN s, r, t"
+    with connection.stream(rels_query, fetch_size=EXPORT_FETCH_SIZE) as records:
+        for row in records:
+            source_class = node_registry.get_class(row['s'].labels, task_label, user_label)
+            target_class = node_registry.get_class(row['t'].labels, task_label, user_label)
+            rel = relation_registry.by_rel_name.get(row['r'].get('name'))
+            if None in (source_class, target_class, rel):
+                continue
+            yield {'kind': 'relation', 'class': rel.__name__,
+                   'source_class': source_class.__name__, 'source_name': row['s'].get('name'),
+                   'target_class': target_class.__name__, 'target_name': row['t'].get('name')}
+
+
+def export_model(connection, task_label, user_label, node_module, relation_module, fmt='jsonl'):
+    """Экспорт модели построчно в формате JSONL или CSV"""
+    records = iter_model_records(connection, task_label, user_label, node_module, relation_module)
+    if fmt == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    elif fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, restval='')
+        writer.writeheader()
+        for record in records:
+            if 'properties' in record:
+                record['properties'] = json.dumps(record['properties'], ensure_ascii=False)
+            writer.writerow(record)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def create_node(node_class, fields, record, user_label):
+    """Пустые значения (нет поля, null в JSONL, пустая ячейка CSV) считаются отсутствующими:
+    свойство не попадает в шаблон MERGE и не порождает второй узел с тем же именем"""
+    attr_values = []
+    for field in fields:
+        if field == 'user_label':
+            attr_values.append(user_label)
+        else:
+            attr_values.append(record.get(field) or None)
+    node = node_class(*attr_values)
+    properties = get_stored_properties(record, fields)
+    if properties:
+        node.properties = dict(node.properties, **properties)
+    return node
+
+
+def get_stored_properties(record, fields):
+    """Дополнительные свойства узла из записи (JSON-объект, в CSV — строка с JSON); имена свойств
+    попадают в текст запроса MERGE, поэтому допускаются только идентификаторы"""
+    properties = record.get('properties') or {}
+    if isinstance(properties, str):
+        properties = json.loads(properties)
+    if not isinstance(properties, dict):
+        raise ValueError("properties is not an object")
+    for key in properties:
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', key):
+            raise ValueError(f"invalid property name {key!r}")
+    return {key: value for key, value in properties.items() if key not in fields and value is not None}
+
+
+def build_item(record, node_registry, relation_registry, user_label):
+    """Проверяет запись по классам NodeItem и ограничениям RelationItem и создает соответствующий объект"""
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    kind = record.get('kind')
+    if kind == 'node':
+        node_class = node_registry.by_name.get(record.get('class'))
+        if node_class is None:
+            raise ValueError(f"unknown node class {record.get('class')!r}")
+        if not record.get('name'):
+            raise ValueError("node name is empty")
+        return create_node(node_class, node_registry.fields[node_class], record, user_label)
+    if kind == 'relation':
+        rel = relation_registry.by_name.get(record.get('class'))
+        if rel is None:
+            raise ValueError(f"unknown relation class {record.get('class')!r}")
+        ends = []
+        for end in ['source', 'target']:
+            node_class = node_registry.by_name.get(record.get(f'{end}_class'))
+            if node_class is None or not record.get(f'{end}_name'):
+                raise ValueError(f"invalid {end} of relation {rel.__name__}")
+            ends.append(create_node(node_class, node_registry.fields[node_class],
+                                    {'name': record[f'{end}_name']}, user_label))
+        # RelationItem проверяет допустимость сочетания классов (constraints)
+        return rel(*ends)
+    raise ValueError(f"unknown record kind {kind!r}")
+
+
+def import_model(connection, lines, user_label, node_module, relation_module, fmt='jsonl',
+                 chunk_size=BATCH_CHUNK_SIZE):
+    """Импорт модели из потока строк: записи проверяются и пишутся порциями через UNWIND.
+    В каждой порции узлы записываются раньше связей, поэтому в файле узлы должны идти до связей с ними"""
+    if fmt == 'jsonl':
+        raw_records = (line for line in lines if line.strip())
+    elif fmt == 'csv':
+        raw_records = csv.DictReader(lines)
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+    node_registry = get_node_registry(node_module)
+    relation_registry = get_relation_registry(relation_module)
+    stats = {'nodes_created': 0, 'relationships_created': 0, 'errors': []}
+    items = []
+
+    def flush():
+        # порция записывается одной транзакцией: узлы и связи между ними фиксируются вместе
+        with connection.unit_of_work() as uow:
+            res = uow.write_batch(items, chunk_size)
+        stats['nodes_created'] += res['nodes_created']
+        stats['relationships_created'] += res['relationships_created']
+        items.clear()
+
+    for record_no, raw in enumerate(raw_records, start=1):
+        try:
+            record = json.loads(raw) if fmt == 'jsonl' else raw
+            items.append(build_item(record, node_registry, relation_registry, user_label))
+        except (ValueError, RuntimeError) as e:
+            stats['errors'].append(f"{record_no}: {e}")
+            continue
+        if len(items) >= chunk_size:
+            flush()
+    if items:
+        flush()
+    return stats
@@ -0,0 +1,76 @@
+import inspect
+import types
+from functools import lru_cache
+
+
+def get_all_subclasses(ni, res: list):
+    """Получение всех допустимых классов объектов"""
+    for node in ni.__subclasses__():
+        if isinstance(node.__init__, types.FunctionType):
+            res.append(node)
+        if len(node.__subclasses__()) > 0:
+            get_all_subclasses(node, res)
+    return res
+
+
+class NodeRegistry:
+    """Соответствие набора меток классу узла и заранее вычисленные поля конструкторов"""
+
+    def __init__(self, node_module):
+        self.root_label = node_module.NodeItem.labels[0]
+        self.classes = get_all_subclasses(node_module.NodeItem, [])
+        self.fields = {}
+        self.by_labels = {}
+        self.by_name = {}
+        for node in self.classes:
+            self.fields[node] = [i for i in inspect.signature(node.__init__).parameters if i != 'self']
+            self.by_labels[frozenset(node.labels) - {self.root_label}] = node
+            self.by_name[node.__name__] = node
+
+    def get_class(self, labels, task_label, user_label):
+        node = self.by_labels.get(frozenset(labels) - {task_label, user_label, self.root_label})
+        if node is not None:
+            return node
+        for label in labels:
+            if label not in [user_label, task_label] and label in self.by_name:
+                return self.by_name[label]
+        return None
+
+    def decode(self, db_node, task_label, user_label):
+        """Получает экземпляр класса узла из узла результата запроса"""
+        node = self.get_class(db_node.labels, task_label, user_label)
+        if node is None:
+            return None
+        attr_values = []
+        for attr in self.fields[node]:
+            if attr == 'user_label':
+                attr_values.append(user_label)
+            else:
+                attr_values.append(db_node.get(attr))
+        return node(*attr_values)
+
+
+class RelationRegistry:
+    """Соответствие rel_name классу связи"""
+
+    def __init__(self, relation_module):
+        self.classes = get_all_subclasses(relation_module.RelationItem, [])
+        self.by_rel_name = {rel.rel_name: rel for rel in self.classes}
+        self.by_name = {rel.__name__: rel for rel in self.classes}
+
+    def decode(self, db_relation, source_node, target_node):
+        """Получает экземпляр класса связи из связи результата запроса"""
+        rel = self.by_rel_name.get(db_relation.get('name'))
+        if rel is None or source_node is None or target_node is None:
+            return None
+        return rel(source_node, target_node)
+
+
+@lru_cache(maxsize=None)
+def get_node_registry(node_module):
+    return NodeRegistry(node_module)
+
+
+@lru_cache(maxsize=None)
+def get_relation_registry(relation_module):
+    return RelationRegistry(relation_module)
@@ -0,0 +1,40 @@
+class ModelSnapshot:
+    """Снимок модели пользователя по задаче: все узлы и связи загружаются одним запросом.
+    version — версия модели в базе, прочитанная до загрузки снимка"""
+
+    def __init__(self, connection, task_label, user_label, version=None):
+        self.task_label = task_label
+        self.user_label = user_label
+        self.version = version
+        self.nodes = []
+        self.relations = []
+        self.nodes_by_label = {}
+        self.load(connection)
+
+    def load(self, connection):
+        query = f"MATCH (a:{self.task_label}:{self.user_label}) " \
+                f"RETURN a, [(a)-[r]->(t:{self.task_label}:{self.user_label}) | [r, t]] AS out"
+        self.nodes = []
+        self.relations = []
+        self.nodes_by_label = {}
+        # индексы строятся по мере чтения, без промежуточного списка записей
+        with connection.stream(query) as records:
+            for row in records:
+                node = row['a']
+                self.nodes.append(node)
+                self.relations.extend((node, r, t) for r, t in row['out'])
+                for label in node.labels:
+                    self.nodes_by_label.setdefault(label, []).append(node)
+
+    def get_nodes(self, label=None):
+        """Все узлы модели или узлы с заданной меткой"""
+        if label is None:
+            return self.nodes
+        return self.nodes_by_label.get(label, [])
+
+    def get_names(self, label):
+        return [node.get('name') for node in self.get_nodes(label)]
+
+    def get_relations(self):
+        """Список троек (источник, связь, цель)"""
+        return self.relations
@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+ARTIFACT_CACHE_SIZE = 128
+# Служебный узел с версией модели (задача, пользователь). Меток задачи и пользователя у него нет,
+# поэтому в выборки модели он не попадает
+META_LABEL = 'ModelMeta'
+
+_lock = threading.Lock()
+# цепочки записей этого процесса с последнего прогона правил: (задача, пользователь) ->
+# {'base': версия после прогона, 'known': последняя учтенная версия, 'touched': имена или None}
+_chains = {}
+_artifacts = OrderedDict()
+# отложенные изменения версий открытой транзакции текущего потока
+_pending = threading.local()
+
+
+def model_key(labels):
+    """(задача, пользователь) по меткам объекта: первая метка — задача, последняя — пользователь"""
+    return labels[0], labels[-1]
+
+
+def bump_tx(tx, task_label, user_label, rules=False):
+    """Увеличивает версию модели в базе в той же транзакции, что и запись в модель; возвращает новую версию.
+    rules=True — запись сделана прогоном правил, и новая версия отмечается как неподвижная точка"""
+    query = f"MERGE (m:{META_LABEL} {{task: $task, user: $user}}) " \
+            f"WITH m, coalesce(m.version, 0) + 1 AS version " \
+            f"SET m.version = version{', m.rules_version = version' if rules else ''} " \
+            f"RETURN m.version AS version"
+    return tx.run(query, task=task_label, user=user_label).single()['version']
+
+
+def mark_rules_tx(tx, task_label, user_label):
+    """Отмечает текущую версию модели как неподвижную точку правил, не меняя ее; возвращает версию"""
+    query = f"MERGE (m:{META_LABEL} {{task: $task, user: $user}}) " \
+            f"WITH m, coalesce(m.version, 0) AS version " \
+            f"SET m.version = version, m.rules_version = version " \
+            f"RETURN m.version AS version"
+    return tx.run(query, task=task_label, user=user_label).single()['version']
+
+
+def read_state_tx(tx, task_label, user_label):
+    """(версия модели, версия последнего прогона правил или None) внутри транзакции"""
+    query = f"MATCH (m:{META_LABEL} {{task: $task, user: $user}}) " \
+            f"RETURN m.version AS version, m.rules_version AS rules_version"
+    record = tx.run(query, task=task_label, user=user_label).single()
+    return (record['version'], record['rules_version']) if record else (0, None)
+
+
+def get_version(connection, task_label, user_label):
+    """Текущая версия модели, хранимая в базе (0 — модель еще не менялась через приложение)"""
+    query = f"MATCH (m:{META_LABEL} {{task: $task, user: $user}}) RETURN m.version AS version"
+    rows = connection.read_all([(query, {'task': task_label, 'user': user_label})])[0]
+    return rows[0]['version'] if rows else 0
+
+
+def register(task_label, user_label, version, touched=None):
+    """Учитывает запись этого процесса, поднявшую версию модели до version.
+    touched — имена затронутых объектов; None означает, что изменения нельзя локализовать (например, удаление).
+    Запись, после которой версия выросла не на единицу, означает чужие изменения: цепочка обрывается"""
+    pending = getattr(_pending, 'versions', None)
+    if pending is not None:
+        pending.append((task_label, user_label, version, None if touched is None else list(touched)))
+        return
+    with _lock:
+        chain = _chains.get((task_label, user_label))
+        if chain is None:
+            return
+        if touched is None or chain['touched'] is None or version != chain['known'] + 1:
+            chain['touched'] = None
+        else:
+            chain['touched'].update(touched)
+        chain['known'] = version
+
+
+def get_touched(task_label, user_label, version, rules_version):
+    """Имена объектов, измененных с прошлого прогона правил до версии version, или None,
+    если изменения неизвестны этому процессу (прогона не было, были чужие записи или удаления)"""
+    if rules_version is not None and version == rules_version:
+        return set()
+    with _lock:
+        chain = _chains.get((task_label, user_label))
+        if chain is None or chain['touched'] is None \
+                or chain['base'] != rules_version or chain['known'] != version:
+            return None
+        return set(chain['touched'])
+
+
+def reset_touched(task_label, user_label, version):
+    """Начинает новую цепочку изменений после прогона правил, оставившего модель в версии version"""
+    with _lock:
+        _chains[(task_label, user_label)] = {'base': version, 'known': version, 'touched': set()}
+
+
+@contextmanager
+def deferred():
+    """Откладывает учет записей до выхода из блока: учет выполняется, только если блок завершился
+    без исключения (транзакция зафиксирована); при откате отложенные записи отбрасываются"""
+    if getattr(_pending, 'versions', None) is not None:
+        yield
+        return
+    _pending.versions = []
+    try:
+        yield
+    except BaseException:
+        _pending.versions = None
+        raise
+    versions, _pending.versions = _pending.versions, None
+    for task_label, user_label, version, touched in versions:
+        register(task_label, user_label, version, touched)
+
+
+def cached_artifact(task_label):
+    """Кэширует результат генератора f(conn, user_label, ...) до изменения версии модели в базе (LRU)"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(conn, user_label, *args, **kwargs):
+            key = (func.__module__, func.__name__, task_label, user_label,
+                   get_version(conn, task_label, user_label), args, tuple(sorted(kwargs.items())))
+            with _lock:
+                if key in _artifacts:
+                    _artifacts.move_to_end(key)
+                    return _artifacts[key]
+
+            res = func(conn, user_label, *args, **kwargs)
+
+            with _lock:
+                _artifacts[key] = res
+                _artifacts.move_to_end(key)
+                while len(_artifacts) > ARTIFACT_CACHE_SIZE:
+                    _artifacts.popitem(last=False)
+            return res
+        return wrapper
+    return decorator
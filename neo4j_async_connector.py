@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from neo4j import AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import DriverError, Neo4jError
+import query_stats
+from neo4j_db_connector import TRANSACTION_RETRY_TIME, _prepare
+
+# Предельное число запросов, одновременно выполняемых одним вызовом gather_reads
+MAX_CONCURRENT_READS = 4
+
+
+async def _fetch_all(tx, query, params):
+    result = await tx.run(query, params)
+    records = [record async for record in result]
+    return records, await result.consume()
+
+
+class AsyncNeo4jConnection:
+    """Соединение на асинхронном драйвере для одновременного выполнения независимых запросов на чтение.
+    Драйвер привязан к собственному циклу событий в фоновом потоке, поэтому одно соединение
+    можно использовать из синхронного кода разных перезапусков страницы (read_all)"""
+
+    def __init__(self, uri, user, pwd, bookmark_manager=None):
+        # менеджер закладок синхронного соединения: чтения начинаются после его зафиксированных записей
+        self.__bookmark_manager = bookmark_manager
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        try:
+            self.__driver = self.__submit(self.__connect(uri, user, pwd))
+        except Exception as e:
+            query_stats.logger.error("Failed to create the async driver: %s", e)
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+            raise e
+
+    @staticmethod
+    async def __connect(uri, user, pwd):
+        driver = AsyncGraphDatabase.driver(uri, auth=(user, pwd), max_transaction_retry_time=TRANSACTION_RETRY_TIME)
+        try:
+            await driver.verify_connectivity()
+        except Exception:
+            # драйвер без проверенного соединения закрывается, чтобы не оставлять его пул
+            await driver.close()
+            raise
+        return driver
+
+    def __submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.__loop).result()
+
+    def close(self):
+        self.__submit(self.__driver.close())
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+
+    async def query(self, query, params=None, db=None, *, access_mode, caller=None, run=None):
+        """Выполняет запрос в управляемой транзакции с повтором при временных ошибках"""
+        start = time.perf_counter()
+        res = None
+        error = None
+        try:
+            async with self.__driver.session(database=db, default_access_mode=access_mode,
+                                            bookmark_manager=self.__bookmark_manager) as session:
+                if access_mode == READ_ACCESS:
+                    res = await session.execute_read(_fetch_all, _prepare(query, access_mode), params or {})
+                else:
+                    res = await session.execute_write(_fetch_all, query, params or {})
+            return res[0]
+        except (Neo4jError, DriverError) as e:
+            query_stats.logger.error("Query failed: %s", e)
+            error = str(e)
+            raise e
+        finally:
+            query_stats.record(query, (time.perf_counter() - start) * 1000,
+                               len(res[0]) if res else None, res[1] if res else None,
+                               caller, error, run)
+
+    async def read_query(self, query, params=None, db=None, caller=None, run=None):
+        """Запрос на чтение; в кластере направляется на реплики чтения"""
+        return await self.query(query, params, db=db, access_mode=READ_ACCESS, caller=caller, run=run)
+
+    async def write_query(self, query, params=None, db=None, caller=None, run=None):
+        """Запрос на запись"""
+        return await self.query(query, params, db=db, access_mode=WRITE_ACCESS, caller=caller, run=run)
+
+    async def gather_reads(self, statements, concurrency=MAX_CONCURRENT_READS, db=None, caller=None, run=None):
+        """Выполняет независимые запросы на чтение [(query, params)] одновременно, не более concurrency сразу;
+        возвращает списки записей в порядке запросов"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def read(query, params):
+            async with semaphore:
+                return await self.read_query(query, params, db=db, caller=caller, run=run)
+
+        return list(await asyncio.gather(*(read(query, params) for query, params in statements)))
+
+    def read_all(self, statements, db=None, concurrency=MAX_CONCURRENT_READS):
+        """Синхронная обертка над gather_reads с интерфейсом Neo4jConnection.read_all:
+        время выполнения определяется самым долгим запросом, а не их суммой"""
+        # вызывающая функция и запуск страницы определяются в потоке вызова, а не в потоке цикла событий
+        caller = query_stats.get_caller()
+        run = query_stats.get_run()
+        return self.__submit(self.gather_reads(statements, concurrency, db=db, caller=caller, run=run))
@@ -1,42 +1,389 @@
-from neo4j import GraphDatabase
-from neo4j.exceptions import ServiceUnavailable
+import threading
+import time
+from contextlib import contextmanager
+from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS, ResultSummary
+from neo4j.exceptions import DriverError, Neo4jError, ServiceUnavailable
+import model_version
+import query_stats
 
-class Neo4jConnection:
+BATCH_CHUNK_SIZE = 1000
+# Число записей, запрашиваемых у сервера за один раз при потоковом чтении
+STREAM_FETCH_SIZE = 1000
+# Период (в секундах), в течение которого соединение после успешного запроса считается живым без проверки
+HEALTH_CHECK_INTERVAL = 60
+# Предельное время (в секундах) повторов управляемой транзакции при временных ошибках (deadlock, смена лидера);
+# паузы между повторами растут экспоненциально
+TRANSACTION_RETRY_TIME = 15.0
+
+
+def _split(rows, chunk_size):
+    for i in range(0, len(rows), chunk_size):
+        yield rows[i:i + chunk_size]
+
+
+def _run_and_consume(tx, query, params):
+    return tx.run(query, params).consume()
+
+
+def _fetch_all(tx, query, params):
+    result = tx.run(query, params)
+    return list(result), result.consume()
+
+
+def _has_updates(work, res):
+    """Изменила ли work данные по счетчикам результата; для произвольных функций считается, что изменила"""
+    if work is _fetch_all:
+        return res[1].counters.contains_updates
+    if isinstance(res, ResultSummary):
+        return res.counters.contains_updates
+    return True
+
+
+def _versioned(work, model):
+    """work, которая в той же транзакции увеличивает версию модели model = (задача, пользователь),
+    если что-то изменила; возвращает (результат work, новая версия или None)"""
+    def versioned_work(tx, *args):
+        res = work(tx, *args)
+        version = model_version.bump_tx(tx, *model) if _has_updates(work, res) else None
+        return res, version
+    return versioned_work
+
+
+def _prepare(query, access_mode):
+    """Текст запроса для выполнения: при включенном профилировании чтения выполняются с PROFILE"""
+    if query_stats.PROFILE_QUERIES and access_mode == READ_ACCESS \
+            and not query.lstrip().upper().startswith(('SHOW', 'PROFILE', 'EXPLAIN')):
+        return 'PROFILE ' + query
+    return query
+
+
+def _statement(work, args):
+    """Текст запроса для журнала: исходный запрос, если он передан первым аргументом, иначе имя функции"""
+    return args[0] if args and isinstance(args[0], str) else f"{work.__module__}.{work.__name__}"
+
+
+def _profiled(access_mode, work, args):
+    """Аргументы _fetch_all с текстом запроса для выполнения (PROFILE); в журнал попадает исходный текст,
+    поэтому у запроса один отпечаток независимо от профилирования"""
+    if work is _fetch_all:
+        return (_prepare(args[0], access_mode),) + tuple(args[1:])
+    return args
+
+
+@contextmanager
+def _recorded_stream(run, query, params, access_mode):
+    """Выполняет запрос через run (сессии или транзакции) и отдает записи по мере перебора;
+    число строк, сводка и ошибка драйвера попадают в журнал запросов при выходе из блока with"""
+    caller = query_stats.get_caller()
+    start = time.perf_counter()
+    stats = {'rows': 0, 'summary': None, 'error': None}
+
+    def count_rows(result):
+        for record in result:
+            stats['rows'] += 1
+            yield record
+
+    try:
+        result = run(_prepare(query, access_mode), params or {})
+        yield count_rows(result)
+        stats['summary'] = result.consume()
+    except ServiceUnavailable as e:
+        query_stats.logger.error("Query failed due to DB connection issue: %s", e)
+        stats['error'] = str(e)
+        raise e
+    except (Neo4jError, DriverError) as e:
+        # исключения кода, перебирающего записи, пробрасываются без записи в журнал как ошибки запроса
+        query_stats.logger.error("Query failed: %s", e)
+        stats['error'] = str(e)
+        raise e
+    finally:
+        query_stats.record(query, (time.perf_counter() - start) * 1000, stats['rows'], stats['summary'],
+                           caller, stats['error'])
+
+
+class BatchWriter:
+    """Пакетная запись NodeItem/RelationItem поверх execute_write (соединение или единица работы)"""
+
+    def merge_nodes(self, nodes, chunk_size=BATCH_CHUNK_SIZE, db=None):
+        """Пакетное создание узлов (NodeItem): группировка по набору меток, один UNWIND на порцию"""
+        groups = {}
+        for node in nodes:
+            properties = node.get_properties()
+            key = (tuple(node.labels), tuple(properties))
+            groups.setdefault(key, []).append(properties)
+
+        nodes_created = 0
+        for (labels, keys), rows in groups.items():
+            props = ', '.join(f'{key}: row.{key}' for key in keys)
+            query = f"UNWIND $rows AS row MERGE (n:{':'.join(labels)} {{{props}}})"
+            for chunk in _split(rows, chunk_size):
+                summary = self.execute_write(_run_and_consume, query, {'rows': chunk}, db=db,
+                                             model=model_version.model_key(labels),
+                                             touched=[row['name'] for row in chunk])
+                nodes_created += summary.counters.nodes_created
+        return nodes_created
+
+    def merge_relations(self, relations, chunk_size=BATCH_CHUNK_SIZE, db=None):
+        """Пакетное создание связей (RelationItem): группировка по названию связи и меткам концов"""
+        groups = {}
+        for rel in relations:
+            key = (rel.rel_name, tuple(rel.source.labels), tuple(rel.target.labels))
+            groups.setdefault(key, []).append({'source_name': rel.source.name, 'target_name': rel.target.name})
+
+        relationships_created = 0
+        for (rel_name, source_labels, target_labels), rows in groups.items():
+            query = f"UNWIND $rows AS row " \
+                    f"MATCH (source:{':'.join(source_labels)} {{name: row.source_name}}), " \
+                    f"(target:{':'.join(target_labels)} {{name: row.target_name}}) " \
+                    f"MERGE (source)-[:SEMANTIC {{name: $rel_name}}]->(target)"
+            for chunk in _split(rows, chunk_size):
+                summary = self.execute_write(_run_and_consume, query, {'rows': chunk, 'rel_name': rel_name}, db=db,
+                                             model=model_version.model_key(source_labels),
+                                             touched=[n for row in chunk for n in row.values()])
+                relationships_created += summary.counters.relationships_created
+        return relationships_created
+
+    def write_batch(self, items, chunk_size=BATCH_CHUNK_SIZE, db=None):
+        """Пакетная запись списка NodeItem/RelationItem: сначала узлы, затем связи между ними"""
+        nodes = [i for i in items if not hasattr(i, 'rel_name')]
+        relations = [i for i in items if hasattr(i, 'rel_name')]
+        return {'nodes_created': self.merge_nodes(nodes, chunk_size, db=db),
+                'relationships_created': self.merge_relations(relations, chunk_size, db=db)}
+
+
+class Neo4jConnection(BatchWriter):
 
     def __init__(self, uri, user, pwd):
         self.__uri = uri
         self.__user = user
         self.__pwd = pwd
         self.__driver = None
+        # закладки общие для всех сессий соединения (и переживают его пересоздание): чтение на реплике
+        # начинается не раньше, чем до нее дойдут уже зафиксированные записи (read-your-writes в кластере)
+        self.__bookmark_manager = GraphDatabase.bookmark_manager()
+        self.__lock = threading.Lock()
+        # время последнего успешного обращения к базе; None — соединение требует проверки
+        self.__last_ok = None
+        self.__connect()
+
+    def __connect(self):
         try:
-            self.__driver = GraphDatabase.driver(self.__uri, auth=(self.__user, self.__pwd))
+            self.__driver = GraphDatabase.driver(self.__uri, auth=(self.__user, self.__pwd),
+                                                 max_transaction_retry_time=TRANSACTION_RETRY_TIME)
             self.__driver.verify_connectivity() # Проверка соединения при инициализации
+            self.__last_ok = time.monotonic()
         except Exception as e:
-            print(f"Failed to create the driver: {e}")
+            query_stats.logger.error("Failed to create the driver: %s", e)
             # ИЗМЕНЕНО: Пробрасываем исключение наверх
             raise e
 
+    @property
+    def bookmark_manager(self):
+        """Менеджер закладок соединения; передается асинхронному соединению, чтобы его чтения видели эти записи"""
+        return self.__bookmark_manager
+
+    def __session(self, **kwargs):
+        return self.__driver.session(bookmark_manager=self.__bookmark_manager, **kwargs)
+
     def close(self):
         if self.__driver is not None:
             self.__driver.close()
 
-    def query(self, query, db=None):
+    def reconnect(self):
+        """Пересоздает драйвер после потери соединения"""
+        with self.__lock:
+            self.close()
+            self.__driver = None
+            self.__connect()
+
+    def ensure_alive(self, interval=HEALTH_CHECK_INTERVAL):
+        """Легкая проверка соединения (RETURN 1) только после ошибки или простоя дольше interval секунд;
+        при неудаче соединение пересоздается"""
+        if self.__last_ok is not None and time.monotonic() - self.__last_ok < interval:
+            return
+        try:
+            with self.__session(default_access_mode=READ_ACCESS) as session:
+                session.run("RETURN 1").consume()
+            self.__last_ok = time.monotonic()
+        except Exception as e:
+            query_stats.logger.warning("Health check failed, reconnecting: %s", e)
+            self.reconnect()
+
+    @contextmanager
+    def stream(self, query, params=None, db=None, access_mode=READ_ACCESS, fetch_size=STREAM_FETCH_SIZE):
+        """Потоковое чтение результата: записи запрашиваются у сервера порциями по fetch_size
+        по мере перебора, сессия остается открытой до выхода из блока with.
+        Запрос выполняется без управляемой транзакции: записи уже переданы вызывающему, поэтому повтор невозможен"""
         if self.__driver is None:
             raise Exception("Driver not initialized!")
-        session = None
-        response = None
+        session = self.__session(database=db, default_access_mode=access_mode, fetch_size=fetch_size)
         try:
-            session = self.__driver.session(database=db) if db is not None else self.__driver.session()
-            response = list(session.run(query))
+            with _recorded_stream(session.run, query, params, access_mode) as records:
+                yield records
+            self.__last_ok = time.monotonic()
         except ServiceUnavailable as e:
-            print(f"Query failed due to DB connection issue: {e}")
+            self.__last_ok = None
             # ИЗМЕНЕНО: Пробрасываем исключение, чтобы Streamlit мог его поймать
             raise e
-        except Exception as e:
-            print(f"Query failed: {e}")
-            # ИЗМЕНЕНО: Пробрасываем исключение
+        finally:
+            session.close()
+
+    def query(self, query, params=None, db=None, *, access_mode, model=None, touched=None):
+        """Выполняет запрос в управляемой транзакции с повтором при временных ошибках;
+        значения передаются через params, чтобы текст запроса (и его план) не менялся.
+        model = (задача, пользователь) — модель, версия которой увеличивается, если запрос ее изменил"""
+        if access_mode == READ_ACCESS:
+            records, _ = self.execute_read(_fetch_all, query, params or {}, db=db)
+        else:
+            records, _ = self.execute_write(_fetch_all, query, params or {}, db=db, model=model, touched=touched)
+        return records
+
+    def read_query(self, query, params=None, db=None):
+        """Запрос на чтение; в кластере направляется на реплики чтения"""
+        return self.query(query, params, db=db, access_mode=READ_ACCESS)
+
+    def write_query(self, query, params=None, db=None, model=None, touched=None):
+        """Запрос на запись"""
+        return self.query(query, params, db=db, access_mode=WRITE_ACCESS, model=model, touched=touched)
+
+    def read_all(self, statements, db=None):
+        """Выполняет независимые запросы на чтение [(query, params)] по очереди; возвращает списки записей"""
+        return [self.read_query(query, params, db=db) for query, params in statements]
+
+    def execute_read(self, work, *args, db=None):
+        """Выполняет work(tx, *args) в транзакции на чтение (в кластере — на реплике чтения)"""
+        return self.__execute(READ_ACCESS, work, args, db)
+
+    def execute_write(self, work, *args, db=None, model=None, touched=None):
+        """Выполняет work(tx, *args) в отдельной транзакции на запись; при изменении модели model
+        ее версия в базе увеличивается в той же транзакции (touched — имена затронутых объектов)"""
+        return self.__execute(WRITE_ACCESS, work, args, db, model, touched)
+
+    def __execute(self, access_mode, work, args, db, model=None, touched=None):
+        """Управляемая транзакция: драйвер повторяет work при временных ошибках с растущими паузами,
+        пока не истечет TRANSACTION_RETRY_TIME, поэтому work не должна иметь побочных эффектов вне транзакции"""
+        if self.__driver is None:
+            raise Exception("Driver not initialized!")
+        statement = _statement(work, args)
+        args = _profiled(access_mode, work, args)
+        caller = query_stats.get_caller()
+        start = time.perf_counter()
+        res = None
+        error = None
+        try:
+            with self.__session(database=db, default_access_mode=access_mode) as session:
+                if access_mode == READ_ACCESS:
+                    res = session.execute_read(work, *args)
+                elif model is None:
+                    res = session.execute_write(work, *args)
+                else:
+                    res, version = session.execute_write(_versioned(work, model), *args)
+                    if version is not None:
+                        model_version.register(*model, version, touched)
+            self.__last_ok = time.monotonic()
+            return res
+        except ServiceUnavailable as e:
+            query_stats.logger.error("Query failed due to DB connection issue: %s", e)
+            self.__last_ok = None
+            error = str(e)
+            raise e
+        except (Neo4jError, DriverError) as e:
+            # исключения самой work (не драйвера и не Cypher) пробрасываются без записи в журнал
+            query_stats.logger.error("Query failed: %s", e)
+            error = str(e)
             raise e
         finally:
-            if session is not None:
-                session.close()
-        return response
\ No newline at end of file
+            rows = None
+            summary = res if isinstance(res, ResultSummary) else None
+            if work is _fetch_all and res is not None:
+                rows, summary = len(res[0]), res[1]
+            query_stats.record(statement, (time.perf_counter() - start) * 1000, rows, summary, caller, error)
+
+    @contextmanager
+    def unit_of_work(self, db=None, fetch_size=STREAM_FETCH_SIZE):
+        """Единица работы: запросы блока выполняются в одной сессии и одной транзакции и фиксируются одним commit;
+        при исключении транзакция откатывается. Повтор при временных ошибках не выполняется — блок повторяет вызывающий.
+        fetch_size — размер порции потокового чтения (stream) для всех запросов блока"""
+        if self.__driver is None:
+            raise Exception("Driver not initialized!")
+        caller = query_stats.get_caller()
+        # изменения версий моделей учитываются только после успешного commit
+        with self.__session(database=db, fetch_size=fetch_size) as session, model_version.deferred():
+            tx = session.begin_transaction()
+            try:
+                yield UnitOfWork(tx)
+                start = time.perf_counter()
+                tx.commit()
+                query_stats.record('COMMIT', (time.perf_counter() - start) * 1000, caller=caller)
+                self.__last_ok = time.monotonic()
+            except Exception as e:
+                query_stats.logger.warning("Unit of work rolled back: %s", e)
+                if isinstance(e, ServiceUnavailable):
+                    self.__last_ok = None
+                raise e
+            finally:
+                # незафиксированная транзакция откатывается при закрытии
+                tx.close()
+
+
+class UnitOfWork(BatchWriter):
+    """Открытая транзакция с интерфейсом соединения: методы NodeItem/RelationItem и пакетная запись
+    принимают ее вместо Neo4jConnection"""
+
+    def __init__(self, tx):
+        self.__tx = tx
+
+    def __run(self, access_mode, work, args, model=None, touched=None):
+        statement = _statement(work, args)
+        args = _profiled(access_mode, work, args)
+        caller = query_stats.get_caller()
+        start = time.perf_counter()
+        res = None
+        error = None
+        try:
+            if model is None:
+                res = work(self.__tx, *args)
+            else:
+                res, version = _versioned(work, model)(self.__tx, *args)
+                if version is not None:
+                    # учет откладывается до фиксации транзакции (model_version.deferred)
+                    model_version.register(*model, version, touched)
+            return res
+        except (Neo4jError, DriverError) as e:
+            error = str(e)
+            raise e
+        finally:
+            rows = None
+            summary = res if isinstance(res, ResultSummary) else None
+            if work is _fetch_all and res is not None:
+                rows, summary = len(res[0]), res[1]
+            query_stats.record(statement, (time.perf_counter() - start) * 1000, rows, summary, caller, error)
+
+    @contextmanager
+    def stream(self, query, params=None, db=None, access_mode=READ_ACCESS, fetch_size=None):
+        """Потоковое чтение внутри транзакции; размер порции задается для всей единицы работы (unit_of_work)"""
+        with _recorded_stream(self.__tx.run, query, params, access_mode) as records:
+            yield records
+
+    def query(self, query, params=None, db=None, *, access_mode, model=None, touched=None):
+        if access_mode == READ_ACCESS:
+            records, _ = self.__run(READ_ACCESS, _fetch_all, (query, params or {}))
+        else:
+            records, _ = self.__run(WRITE_ACCESS, _fetch_all, (query, params or {}), model, touched)
+        return records
+
+    def read_query(self, query, params=None, db=None):
+        return self.query(query, params, db=db, access_mode=READ_ACCESS)
+
+    def write_query(self, query, params=None, db=None, model=None, touched=None):
+        return self.query(query, params, db=db, access_mode=WRITE_ACCESS, model=model, touched=touched)
+
+    def read_all(self, statements, db=None):
+        """Независимые запросы на чтение [(query, params)] в транзакции единицы работы, по очереди"""
+        return [self.read_query(query, params, db=db) for query, params in statements]
+
+    def execute_read(self, work, *args, db=None):
+        return self.__run(READ_ACCESS, work, args)
+
+    def execute_write(self, work, *args, db=None, model=None, touched=None):
+        return self.__run(WRITE_ACCESS, work, args, model, touched)
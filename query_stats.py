@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+# Число последних запросов, хранимых в журнале процесса
+QUERY_LOG_SIZE = 5000
+# Порог медленного запроса, мс (переменная окружения NEO4J_SLOW_QUERY_MS)
+SLOW_QUERY_MS = float(os.getenv('NEO4J_SLOW_QUERY_MS', '500'))
+# NEO4J_PROFILE_QUERIES=1 — запросы на чтение выполняются с PROFILE, чтобы получить db hits
+PROFILE_QUERIES = os.getenv('NEO4J_PROFILE_QUERIES', '') == '1'
+
+# модули слоя доступа к базе, которые пропускаются при поиске вызывающей функции
+_SKIP_MODULES = {__name__, 'neo4j_db_connector', 'neo4j_async_connector', 'contextlib'}
+
+# журнал слоя доступа к базе: медленные запросы и ошибки драйвера
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_records = deque(maxlen=QUERY_LOG_SIZE)
+# функция, возвращающая метку текущего запуска скрипта (задается приложением)
+_run_provider = None
+
+
+def set_run_provider(provider):
+    """Задает функцию, возвращающую метку текущего перезапуска страницы"""
+    global _run_provider
+    _run_provider = provider
+
+
+def get_run():
+    if _run_provider is None:
+        return None
+    try:
+        return _run_provider()
+    except Exception:
+        return None
+
+
+def get_caller():
+    """Первая функция вне слоя доступа к базе: модуль.функция"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__')
+        if module not in _SKIP_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def fingerprint(query):
+    """Текст запроса без литералов и лишних пробелов и его короткий хэш"""
+    text = re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", '?', query)
+    text = re.sub(r'\b\d+(?:\.\d+)?\b', '?', text)
+    text = ' '.join(text.split())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12], text
+
+
+def get_db_hits(profile):
+    """Сумма db hits по дереву плана из результата PROFILE"""
+    if not profile:
+        return None
+    hits = profile.get('dbHits', 0)
+    for child in profile.get('children', []):
+        hits += get_db_hits(child) or 0
+    return hits
+
+
+def record(query, time_ms, rows=None, summary=None, caller=None, error=None, run=None):
+    """Добавляет запрос в журнал; медленные запросы дополнительно выводятся в лог"""
+    key, text = fingerprint(query)
+    entry = {
+        'ts': time.time(),
+        'run': run if run is not None else get_run(),
+        'caller': caller or get_caller(),
+        'fingerprint': key,
+        'statement': text,
+        'time_ms': round(time_ms, 2),
+        'rows': rows,
+        'db_hits': get_db_hits(summary.profile) if summary is not None else None,
+        'server_ms': summary.result_available_after if summary is not None else None,
+        'error': error,
+    }
+    with _lock:
+        _records.append(entry)
+    if time_ms >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.0f ms, %s, %s): %s", time_ms, entry['caller'], key, text[:200])
+    return entry
+
+
+def get_records(run=None):
+    """Журнал запросов, целиком или для одного запуска страницы"""
+    with _lock:
+        records = list(_records)
+    if run is None:
+        return records
+    return [r for r in records if r['run'] == run]
+
+
+def group_records(records, key):
+    """Сводка по ключу (run, caller, fingerprint): число запросов, строк, db hits и время"""
+    res = {}
+    for r in records:
+        group = res.setdefault(r[key], {key: r[key], 'queries': 0, 'rows': 0, 'db_hits': 0,
+                                        'time_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+        group['queries'] += 1
+        group['rows'] += r['rows'] or 0
+        group['db_hits'] += r['db_hits'] or 0
+        group['time_ms'] += r['time_ms']
+        group['max_ms'] = max(group['max_ms'], r['time_ms'])
+        group['errors'] += 1 if r['error'] else 0
+    return sorted(res.values(), key=lambda g: g['time_ms'], reverse=True)
+
+
+def get_slow_records(threshold_ms=None):
+    threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+    return [r for r in get_records() if r['time_ms'] >= threshold_ms]
+
+
+def dump_json(records=None):
+    """Журнал запросов в формате JSON"""
+    return json.dumps(get_records() if records is None else records, ensure_ascii=False, indent=1)
+
+
+def clear():
+    with _lock:
+        _records.clear()
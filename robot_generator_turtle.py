@@ -1,75 +1,67 @@
-from jinja2 import Template
-from robot_generator import get_states, get_states_to_transit, get_condition, get_operations_after_transition
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from robot_state_machine import get_state_machine
 from dotenv import load_dotenv
 import neo4j_db_connector as nc
+import model_version
 import os
+import re
 
-def get_start_state(conn, user_label):
-    query = f'MATCH (a:{user_label}:Robot:State) WHERE NOT (:{user_label}:Robot:State)-[{{name: "переходить в"}}]->(a) RETURN a'
-    res = conn.query(query)
-    return res[0]['a']['codename']
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_NAME = "robot_generator_template.jinja2"
+OUTPUT_DIR = os.path.join(TEMPLATE_DIR, "generated")
 
-def get_end_state(conn, user_label):
-    query = f'MATCH (a:{user_label}:Robot:State) WHERE NOT (a)-[{{name: "переходить в"}}]->(:{user_label}:Robot:State) RETURN a'
-    res = conn.query(query)
-    return res[0]['a']['codename']
+# Шаблон компилируется один раз на процесс; байткод кэшируется между перезапусками
+jinja_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR),
+                        bytecode_cache=FileSystemBytecodeCache(),
+                        auto_reload=False,
+                        trim_blocks=True,
+                        lstrip_blocks=True)
 
-# НОВАЯ ФУНКЦИЯ для получения процессов
-def get_processes_for_state(state_name, conn, user_label):
-    """Получает все процессы, которые необходимо выполнить внутри состояния"""
-    query = f"""
-    MATCH (s:State:{user_label} {{name: '{state_name}'}})-[{{name: 'выполнять в'}}]->(p:Process:{user_label})
-    RETURN p.name as name, p.codename as codename
-    """
-    res = conn.query(query)
-    return {item['codename']: item['name'] for item in res}
 
-def get_state_dict(conn, user_label, end_state):
-    res = {}
-    states = get_states(conn, user_label)
-
-    for state_codename in states:
-        state_name = states[state_codename]
-        if state_codename != end_state:
-            state_info = {}
-            transition_list = []
-            
-            # Получаем процессы для текущего состояния
-            state_info['processes'] = get_processes_for_state(state_name, conn, user_label)
-            
-            linked_states = get_states_to_transit(state_name, conn, user_label)
-
-            for linked_state_codename in linked_states:
-                trans_info = {}
-                linked_state_name = linked_states[linked_state_codename]
-                
-                trans_info['state_to'] = linked_state_codename
+def get_output_path(user_label):
+    """Путь к файлу со сгенерированным кодом для отдельного пользователя"""
+    # метка пользователя попадает в имя файла, поэтому разделители путей и '..' недопустимы
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', user_label or ''):
+        raise ValueError(f"Invalid user label for output file: {user_label!r}")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, f"robot_generated_code_{user_label}.py")
 
-                condition_codename, condition_name = get_condition(state_name, linked_state_name, conn, user_label)
-                trans_info['condition'] = condition_codename
 
-                actions_after = get_operations_after_transition(condition_name, conn, user_label)
-                trans_info['actions_after'] = {i['codename']: i['name'] for _, i in actions_after.iterrows()}
-
-                transition_list.append(trans_info)
-            
+def get_state_dict(state_machine):
+    """Формирует структуру state_list для шаблона из извлеченного автомата"""
+    res = {}
+    for state_codename in state_machine['states']:
+        if state_codename != state_machine['end_state']:
+            state_info = {'processes': state_machine['processes'][state_codename]}
+            transition_list = []
+            for transition in state_machine['transitions'][state_codename]:
+                transition_list.append({
+                    'state_to': transition['state_to'],
+                    'condition': transition['condition'],
+                    'actions_after': {i['codename']: i['name'] for i in transition['actions_after']},
+                })
             state_info['transitions'] = transition_list
             res[state_codename] = state_info
     return res
 
-def get_template(conn, user_label):
-    start_state = get_start_state(conn, user_label)
-    end_state = get_end_state(conn, user_label)
-    state_list = get_state_dict(conn, user_label, end_state)
+@model_version.cached_artifact('Robot')
+def render_template(conn, user_label):
+    """Генерирует программу в памяти; результат кэшируется до изменения модели"""
+    state_machine = get_state_machine(conn, user_label)
+    state_list = get_state_dict(state_machine)
+
+    return jinja_env.get_template(TEMPLATE_NAME).render(
+        start_state=state_machine['start_state'],
+        end_state=state_machine['end_state'],
+        state_list=state_list,
+    )
 
-    with open("robot_generator_template.jinja2") as f:
-        res = Template(f.read(), trim_blocks=True, lstrip_blocks=True).render(
-            start_state=start_state,
-            end_state=end_state,
-            state_list=state_list,
-        )
-    with open("robot_generated_code.py", mode='w') as f:
-        f.write(res)
+def get_template(conn, user_label, write_file=False):
+    """Генерирует программу; write_file=True дополнительно сохраняет ее в файл пользователя"""
+    res = render_template(conn, user_label)
+    if write_file:
+        with open(get_output_path(user_label), mode='w') as f:
+            f.write(res)
     return res
 
 if __name__ == "__main__":
@@ -77,4 +69,4 @@ if __name__ == "__main__":
     conn = nc.Neo4jConnection(uri=os.getenv("NEO4J_URI"),
                               user=os.getenv("NEO4J_USERNAME"),
                               pwd=os.getenv("NEO4J_PASSWORD"))
-    print(get_template(conn, 'demo'))
\ No newline at end of file
+    print(get_template(conn, 'demo', write_file=True))
\ No newline at end of file
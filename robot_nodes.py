@@ -1,19 +1,37 @@
+import model_version
+
+
 class NodeItem:
     labels = ['Robot']
-    subquery = None
+    properties = {}
+
+    def get_properties(self):
+        """Заданные свойства узла: отсутствующие значения (None) в шаблон не попадают"""
+        return {key: value for key, value in self.properties.items() if value is not None}
+
+    def get_subquery(self, prefix=''):
+        """Шаблон узла: метки остаются в тексте запроса, значения свойств передаются параметрами"""
+        props = ', '.join(f'{key}: ${prefix}{key}' for key in self.get_properties())
+        return f":{':'.join(self.labels)} {{{props}}}"
+
+    def get_params(self, prefix=''):
+        return {prefix + key: value for key, value in self.get_properties().items()}
+
+    @property
+    def subquery(self):
+        return self.get_subquery()
 
     def db_create_node(self, connection):
-        connection.query(f"CREATE ({self.subquery})")
+        connection.write_query(f"CREATE ({self.subquery})", self.get_params(),
+                               model=model_version.model_key(self.labels), touched=[self.name])
 
     def db_merge_node(self, connection):
-        connection.query(f"MERGE ({self.subquery})")
-
-    def get_node_id(self, connection):
-        result = connection.query(f"MATCH (n{self.subquery}) RETURN ID(n) AS node_id")
-        return result[0]['node_id']
+        connection.write_query(f"MERGE ({self.subquery})", self.get_params(),
+                               model=model_version.model_key(self.labels), touched=[self.name])
 
     def db_delete_node(self, connection):
-        connection.query(f"MERGE (n{self.subquery}) DETACH DELETE n")
+        connection.write_query(f"MATCH (n{self.subquery}) DETACH DELETE n", self.get_params(),
+                               model=model_version.model_key(self.labels))
 
 
 class State(NodeItem):
@@ -25,7 +43,7 @@ class State(NodeItem):
         self.name = name
         self.labels = self.labels + [user_label]
         self.codename = codename
-        self.subquery = f":{':'.join(self.labels)} {{name: '{self.name}', codename: '{self.codename}'}}"
+        self.properties = {'name': self.name, 'codename': self.codename}
 
 
 class Predicate(NodeItem):
@@ -37,7 +55,7 @@ class Predicate(NodeItem):
         self.name = name
         self.labels = self.labels + [user_label]
         self.codename = codename
-        self.subquery = f":{':'.join(self.labels)} {{name: '{self.name}', codename: '{self.codename}'}}"
+        self.properties = {'name': self.name, 'codename': self.codename}
 
 
 class Action(NodeItem):
@@ -49,7 +67,7 @@ class Action(NodeItem):
         self.name = name
         self.labels = self.labels + [user_label]
         self.codename = codename
-        self.subquery = f":{':'.join(self.labels)} {{name: '{self.name}', codename: '{self.codename}'}}"
+        self.properties = {'name': self.name, 'codename': self.codename}
 
 
 class Transition(NodeItem):
@@ -60,7 +78,7 @@ class Transition(NodeItem):
     def __init__(self, name: str, user_label: str):
         self.name = name
         self.labels = self.labels + [user_label]
-        self.subquery = f":{':'.join(self.labels)} {{name: '{self.name}'}}"
+        self.properties = {'name': self.name}
 
 # ИСПРАВЛЕНИЕ: Добавлен класс "Процесс"
 class Process(NodeItem):
@@ -72,4 +90,4 @@ class Process(NodeItem):
         self.name = name
         self.labels = self.labels + [user_label]
         self.codename = codename
-        self.subquery = f":{':'.join(self.labels)} {{name: '{self.name}', codename: '{self.codename}'}}"
\ No newline at end of file
+        self.properties = {'name': self.name, 'codename': self.codename}
\ No newline at end of file
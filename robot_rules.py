@@ -2,14 +2,25 @@ import pandas as pd
 
 
 def create_rules(user_label, task_label):
+    """Правила задачи: описание, полный запрос и запрос по изменениям (delta_code).
+    delta_code рассматривает только сопоставления, затрагивающие объекты с именами из $touched,
+    и возвращает имена объектов, которых коснулся, в столбце touched"""
     rules = []
 
+    transition_merge = f"""MERGE (p:{user_label}:{task_label}:Transition {{name: 'Переход из «' + s1.name + '» в «' + s2.name + '»'}})
+MERGE (p)-[:SEMANTIC {{name: 'быть переходом из'}}]->(s1)
+MERGE (p)-[:SEMANTIC {{name: 'быть переходом в'}}]->(s2)"""
     rules.append((
         """Если состояния s1 и s2 связаны отношением «переходить в», то необходимо создать соответствующий переход.""",
         f"""MATCH (s1:{user_label}:{task_label})-[{{name: "переходить в"}}]->(s2:{user_label}:{task_label})
-MERGE (p:{user_label}:{task_label}:Transition {{name: 'Переход из «' + s1.name + '» в «' + s2.name + '»'}})
-MERGE (p)-[:SEMANTIC {{name: 'быть переходом из'}}]->(s1)
-MERGE (p)-[:SEMANTIC {{name: 'быть переходом в'}}]->(s2)"""
+""" + transition_merge,
+        f"""CALL {{
+MATCH (s1:{user_label}:{task_label})-[{{name: "переходить в"}}]->(s2:{user_label}:{task_label}) WHERE s1.name IN $touched RETURN s1, s2
+UNION
+MATCH (s1:{user_label}:{task_label})-[{{name: "переходить в"}}]->(s2:{user_label}:{task_label}) WHERE s2.name IN $touched RETURN s1, s2
+}}
+""" + transition_merge + """
+RETURN [p.name, s1.name, s2.name] AS touched"""
     ))
 
-    return pd.DataFrame(rules, columns=['desc', 'code'])
+    return pd.DataFrame(rules, columns=['desc', 'code', 'delta_code'])
@@ -0,0 +1,97 @@
+def get_state_query(user_label):
+    """Запрос состояний вместе с процессами, связанными состояниями и признаками начала/конца"""
+    query = f"""
+MATCH (s:Robot:State:{user_label})
+RETURN s.codename AS codename, s.name AS name,
+[(s)-[{{name: 'выполнять в'}}]->(p:Process:{user_label}) | p {{.codename, .name}}] AS processes,
+[(s)-[{{name: 'переходить в'}}]->(s2) | s2 {{.codename, .name}}] AS targets,
+EXISTS {{ MATCH (:{user_label}:Robot:State)-[{{name: 'переходить в'}}]->(s) }} AS has_incoming,
+EXISTS {{ MATCH (s)-[{{name: 'переходить в'}}]->(:{user_label}:Robot:State) }} AS has_outgoing"""
+    return query
+
+
+def get_condition_query(user_label):
+    """Запрос условий всех переходов между состояниями"""
+    query = f"""
+MATCH (t)-[{{name: 'быть переходом из'}}]->(s1:State:{user_label}),
+(t)-[{{name: 'быть переходом в'}}]->(s2:State:{user_label}),
+(p)-[{{name: 'быть условием перехода'}}]->(t)
+RETURN s1.name AS state_from, s2.name AS state_to, p.name AS name, p.codename AS codename"""
+    return query
+
+
+def get_action_query(user_label):
+    """Запрос действий, выполняемые после перехода, для всех условий перехода"""
+    query = f"""
+MATCH (pr:Predicate:{user_label})-[{{name: 'быть условием перехода'}}]->(t),
+(t)-[{{name: 'вызывать'}}]->(p)
+RETURN pr.name AS predicate, p.name AS name, p.codename AS codename, labels(p) AS labels"""
+    return query
+
+
+def get_operations_before_query(user_label):
+    """Запрос операций, которые необходимо выполнить до перехода, для всех состояний"""
+    query = f"""
+MATCH (s:State:{user_label}),
+(t)-[{{name: 'быть переходом из'}}]->(s),
+(process_name)-[{{name: 'предшествовать'}}]->(t)
+RETURN s.name AS state, process_name.name AS name, process_name.codename AS codename, labels(process_name) AS labels"""
+    return query
+
+
+def group_operations(rows, key):
+    """Группирует операции по ключу, убирая повторы (name, codename) с сохранением порядка"""
+    res = {}
+    for row in rows:
+        operations = res.setdefault(row[key], [])
+        if not any(o['name'] == row['name'] and o['codename'] == row['codename'] for o in operations):
+            operations.append({'name': row['name'], 'codename': row['codename'], 'labels': row['labels']})
+    return res
+
+
+def get_state_machine(conn, user_label):
+    """Извлекает автомат (состояния, процессы, переходы, условия и действия) фиксированным числом запросов.
+    Запросы независимы, поэтому conn.read_all может выполнять их одновременно (AsyncNeo4jConnection)"""
+    state_rows, condition_rows, action_rows, before_rows = conn.read_all([
+        (get_state_query(user_label), {}),
+        (get_condition_query(user_label), {}),
+        (get_action_query(user_label), {}),
+        (get_operations_before_query(user_label), {}),
+    ])
+    state_rows = {r['codename']: r for r in state_rows}
+
+    conditions = {}
+    for row in condition_rows:
+        conditions.setdefault((row['state_from'], row['state_to']), (row['codename'], row['name']))
+
+    actions = group_operations(action_rows, 'predicate')
+    operations_before = group_operations(before_rows, 'state')
+
+    states = {}
+    processes = {}
+    actions_before = {}
+    transitions = {}
+    for codename, row in state_rows.items():
+        states[codename] = row['name']
+        processes[codename] = {p['codename']: p['name'] for p in row['processes']}
+        actions_before[codename] = operations_before.get(row['name'], [])
+        targets = {s['codename']: s['name'] for s in row['targets']}
+        transitions[codename] = []
+        for target_codename, target_name in targets.items():
+            cond, cond_name = conditions.get((row['name'], target_name), (None, None))
+            transitions[codename].append({
+                'state_to': target_codename,
+                'state_to_name': target_name,
+                'condition': cond,
+                'condition_name': cond_name,
+                'actions_after': actions.get(cond_name, []),
+            })
+
+    return {
+        'states': states,
+        'start_state': next((c for c, r in state_rows.items() if not r['has_incoming']), None),
+        'end_state': next((c for c, r in state_rows.items() if not r['has_outgoing']), None),
+        'processes': processes,
+        'actions_before': actions_before,
+        'transitions': transitions,
+    }
@@ -0,0 +1,78 @@
+import time
+import pandas as pd
+import model_version
+
+MAX_ITERATIONS = 10
+
+
+def run_to_fixpoint(tx, rules, max_iterations, touched=None):
+    """Повторяет набор правил в одной транзакции, пока очередной проход ничего не создает.
+    touched=None — полный прогон; иначе правила получают $touched и возвращают имена затронутых объектов,
+    из которых складывается $touched следующего прохода"""
+    stats = [{'nodes_created': 0, 'relationships_created': 0, 'time_ms': 0.0} for _ in rules]
+    iterations = 0
+    while iterations < max_iterations:
+        if touched is not None and not touched:
+            break
+        iterations += 1
+        changed = False
+        next_touched = set()
+        for rule_stats, code in zip(stats, rules):
+            start = time.perf_counter()
+            if touched is None:
+                result = tx.run(code)
+            else:
+                result = tx.run(code, touched=list(touched))
+                for record in result:
+                    next_touched.update(record['touched'])
+            counters = result.consume().counters
+            rule_stats['time_ms'] += (time.perf_counter() - start) * 1000
+            rule_stats['nodes_created'] += counters.nodes_created
+            rule_stats['relationships_created'] += counters.relationships_created
+            if counters.nodes_created or counters.relationships_created:
+                changed = True
+        if not changed:
+            break
+        if touched is not None:
+            touched = next_touched
+    return stats, iterations
+
+
+def run_rules_tx(tx, rules, delta_rules, max_iterations, task_label, user_label):
+    """Прогон правил до неподвижной точки. Режим выбирается по версиям модели, прочитанным в этой же транзакции:
+    по изменениям (delta_rules), если все записи с прошлого прогона известны этому процессу, иначе полный.
+    Версия модели увеличивается, только если правила что-то создали; в любом случае она отмечается
+    как неподвижная точка. Возвращает (статистика, число проходов, режим, версия после прогона)"""
+    touched = None
+    if delta_rules is not None:
+        version, rules_version = model_version.read_state_tx(tx, task_label, user_label)
+        touched = model_version.get_touched(task_label, user_label, version, rules_version)
+    if touched is None:
+        stats, iterations = run_to_fixpoint(tx, rules, max_iterations)
+    else:
+        stats, iterations = run_to_fixpoint(tx, delta_rules, max_iterations, touched)
+    if any(s['nodes_created'] or s['relationships_created'] for s in stats):
+        version = model_version.bump_tx(tx, task_label, user_label, rules=True)
+    else:
+        version = model_version.mark_rules_tx(tx, task_label, user_label)
+    return stats, iterations, 'full' if touched is None else 'incremental', version
+
+
+def run_rules(connection, rules_df, task_label, user_label, max_iterations=MAX_ITERATIONS, full=False):
+    """Выполняет правила задачи до неподвижной точки; возвращает статистику по правилам, число проходов и режим.
+    По умолчанию правила применяются только к объектам, измененным с прошлого прогона (delta_code);
+    полный прогон выполняется по запросу, при первом запуске и после изменений, которые нельзя локализовать
+    (удаления, записи других процессов)"""
+    rules = rules_df[rules_df['code'].notna()].reset_index(drop=True)
+    delta = not full and 'delta_code' in rules and rules['delta_code'].notna().all()
+
+    stats, iterations, mode, version = connection.execute_write(
+        run_rules_tx, list(rules['code']), list(rules['delta_code']) if delta else None,
+        max_iterations, task_label, user_label)
+    # созданное правилами уже доведено до неподвижной точки: следующий прогон учитывает записи после него
+    model_version.reset_touched(task_label, user_label, version)
+
+    stats_df = pd.DataFrame(stats)
+    stats_df.insert(0, 'rule', rules.index + 1)
+    stats_df['time_ms'] = stats_df['time_ms'].round(1)
+    return stats_df, iterations, mode
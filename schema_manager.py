@@ -0,0 +1,80 @@
+import inspect
+import model_version
+import query_stats
+
+# модули, схема которых уже проверена в текущем процессе
+_bootstrapped = set()
+
+
+def get_node_hierarchy(node_class, res: list):
+    """Получение всех классов иерархии, включая абстрактные (без собственного __init__)"""
+    res.append(node_class)
+    for node in node_class.__subclasses__():
+        get_node_hierarchy(node, res)
+    return res
+
+
+def has_codename(node_class):
+    """Принимает ли класс или кто-то из его наследников codename в конструкторе"""
+    for node in get_node_hierarchy(node_class, []):
+        if 'codename' in inspect.signature(node.__init__).parameters:
+            return True
+    return False
+
+
+def get_index_specs(node_module, text=False):
+    """Список индексов (тип, метка, свойство) для всех классов модуля узлов"""
+    specs = []
+    for node in get_node_hierarchy(node_module.NodeItem, []):
+        label = node.labels[-1]
+        props = ['name', 'codename'] if has_codename(node) else ['name']
+        for prop in props:
+            specs.append(('RANGE', label, prop))
+        if text:
+            specs.append(('TEXT', label, 'name'))
+    return list(dict.fromkeys(specs))
+
+
+def get_index_name(index_type, label, prop):
+    return f"{index_type.lower()}_{label.lower()}_{prop}"
+
+
+def get_existing_indexes(connection):
+    res = connection.read_query("SHOW INDEXES YIELD name, type, labelsOrTypes, properties")
+    existing_names = {r['name'] for r in res}
+    existing_specs = set()
+    for r in res:
+        if r['labelsOrTypes'] and r['properties'] and len(r['properties']) == 1:
+            for label in r['labelsOrTypes']:
+                existing_specs.add((r['type'], label, r['properties'][0]))
+    return existing_names, existing_specs
+
+
+def ensure_indexes(connection, node_modules, text=False):
+    """Создает недостающие индексы для классов узлов и возвращает имена созданных индексов"""
+    modules = [m for m in node_modules if m.__name__ not in _bootstrapped]
+    if not modules:
+        return []
+
+    existing_names, existing_specs = get_existing_indexes(connection)
+    created = []
+    for node_module in modules:
+        for index_type, label, prop in get_index_specs(node_module, text):
+            name = get_index_name(index_type, label, prop)
+            if name in existing_names or (index_type, label, prop) in existing_specs:
+                continue
+            connection.write_query(f"CREATE {index_type} INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})")
+            existing_names.add(name)
+            existing_specs.add((index_type, label, prop))
+            created.append(name)
+        _bootstrapped.add(node_module.__name__)
+
+    if created:
+        query_stats.logger.info("Created indexes: %s", ', '.join(created))
+    return created
+
+
+def ensure_version_constraint(connection):
+    """Ограничение уникальности служебного узла версии модели по (задача, пользователь)"""
+    connection.write_query(f"CREATE CONSTRAINT model_meta_key IF NOT EXISTS "
+                           f"FOR (m:{model_version.META_LABEL}) REQUIRE (m.task, m.user) IS UNIQUE")
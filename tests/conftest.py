@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_version
+import neo4j_db_connector as nc
+import query_stats
+from fakes import FakeDriver
+
+
+@pytest.fixture(autouse=True)
+def reset_model_version():
+    """Состояние model_version общее для процесса: каждый тест начинает с чистого"""
+    model_version._chains.clear()
+    model_version._artifacts.clear()
+    model_version._pending.versions = None
+    yield
+    model_version._chains.clear()
+    model_version._artifacts.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_query_stats():
+    """Журнал запросов общий для процесса: каждый тест видит только свои запросы"""
+    query_stats.clear()
+    yield
+    query_stats.clear()
+
+
+@pytest.fixture
+def driver():
+    return FakeDriver()
+
+
+@pytest.fixture
+def connection(driver, monkeypatch):
+    """Neo4jConnection поверх поддельного драйвера"""
+    monkeypatch.setattr(nc.GraphDatabase, 'driver', lambda *args, **kwargs: driver)
+    return nc.Neo4jConnection('bolt://fake', 'neo4j', 'pwd')
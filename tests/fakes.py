@@ -0,0 +1,170 @@
+"""Поддельный драйвер Neo4j для тестов слоя доступа к базе без сервера.
+
+Запросы к служебному узлу версии модели (ModelMeta) выполняются в памяти драйвера с фиксацией
+при commit; остальные запросы передаются обработчику handler(query, params) -> (records, stats)"""
+from types import SimpleNamespace
+
+from neo4j import ResultSummary
+from neo4j.exceptions import TransientError
+
+SERVER = SimpleNamespace(protocol_version=(5, 0))
+
+
+def make_summary(stats=None):
+    return ResultSummary(None, True, True, {'server': SERVER, 'stats': stats or {}})
+
+
+def nodes_created(query, params):
+    """Обработчик, для которого каждый запрос создает один узел"""
+    return [{'count': 1}], {'nodes-created': 1}
+
+
+class FakeNode(dict):
+    """Узел результата запроса: свойства и метки"""
+
+    def __init__(self, labels, **properties):
+        super().__init__(properties)
+        self.labels = frozenset(labels)
+        self.element_id = f"{':'.join(sorted(labels))}:{properties.get('name')}"
+
+
+class FakeResult:
+
+    def __init__(self, records, stats=None):
+        self.records = records
+        self.stats = stats or {}
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def consume(self):
+        return make_summary(self.stats)
+
+
+class FakeTx:
+
+    def __init__(self, driver):
+        self.driver = driver
+        # изменения служебных узлов видны только внутри транзакции до commit
+        self.meta = {key: dict(value) for key, value in driver.meta.items()}
+        self.committed = False
+        self.closed = False
+
+    def run(self, query, params=None, **kwargs):
+        params = dict(params or {}, **kwargs)
+        self.driver.log.append((query, params))
+        if 'ModelMeta' in query:
+            return self.run_meta(query, params)
+        records, stats = self.driver.handler(query, params)
+        return FakeResult(records, stats)
+
+    def run_meta(self, query, params):
+        key = (params['task'], params['user'])
+        if query.startswith('MERGE'):
+            meta = self.meta.setdefault(key, {'version': 0, 'rules_version': None})
+            if '+ 1' in query:
+                meta['version'] += 1
+            if 'rules_version' in query:
+                meta['rules_version'] = meta['version']
+            return FakeResult([dict(meta)], {'properties-set': 1})
+        if query.startswith('MATCH'):
+            return FakeResult([dict(self.meta[key])] if key in self.meta else [])
+        return FakeResult([])
+
+    def commit(self):
+        self.driver.meta = self.meta
+        self.driver.commits += 1
+        self.committed = True
+
+    def rollback(self):
+        self.driver.rollbacks += 1
+
+    def close(self):
+        if not self.committed and not self.closed:
+            self.rollback()
+        self.closed = True
+
+
+class FakeSession:
+
+    def __init__(self, driver, fetch_size=None):
+        self.driver = driver
+        self.fetch_size = fetch_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def __execute(self, work, args):
+        # как управляемая транзакция драйвера: work повторяется при временной ошибке
+        while True:
+            tx = FakeTx(self.driver)
+            try:
+                res = work(tx, *args)
+                if self.driver.failures:
+                    self.driver.failures -= 1
+                    raise TransientError('Deadlock detected')
+                tx.commit()
+                return res
+            except TransientError:
+                self.driver.retries += 1
+            finally:
+                tx.close()
+
+    def execute_read(self, work, *args):
+        return self.__execute(work, args)
+
+    def execute_write(self, work, *args):
+        return self.__execute(work, args)
+
+    def run(self, query, params=None):
+        tx = FakeTx(self.driver)
+        return tx.run(query, params)
+
+    def begin_transaction(self):
+        return FakeTx(self.driver)
+
+
+class FakeDriver:
+
+    def __init__(self, handler=None, failures=0):
+        self.handler = handler or (lambda query, params: ([], {}))
+        # число временных ошибок перед успешной фиксацией управляемой транзакции
+        self.failures = failures
+        self.meta = {}
+        self.log = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.retries = 0
+        self.sessions_fetch_size = []
+        self.sessions_access_mode = []
+        self.sessions_bookmark_manager = []
+
+    def session(self, database=None, default_access_mode=None, fetch_size=None, bookmark_manager=None):
+        self.sessions_bookmark_manager.append(bookmark_manager)
+        self.sessions_fetch_size.append(fetch_size)
+        self.sessions_access_mode.append(default_access_mode)
+        return FakeSession(self, fetch_size)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+    def version(self, task, user):
+        return self.meta.get((task, user), {}).get('version', 0)
+
+    def rules_version(self, task, user):
+        return self.meta.get((task, user), {}).get('rules_version')
+
+    def statements(self, fragment):
+        return [(query, params) for query, params in self.log if fragment in query]
@@ -0,0 +1,25 @@
+import pytest
+from neo4j.exceptions import ServiceUnavailable
+
+import neo4j_async_connector as ac
+
+
+class FailingAsyncDriver:
+
+    def __init__(self):
+        self.closed = False
+
+    async def verify_connectivity(self):
+        raise ServiceUnavailable('Database is restarting')
+
+    async def close(self):
+        self.closed = True
+
+
+def test_driver_is_closed_when_connectivity_check_fails(monkeypatch):
+    driver = FailingAsyncDriver()
+    monkeypatch.setattr(ac.AsyncGraphDatabase, 'driver', lambda *args, **kwargs: driver)
+
+    with pytest.raises(ServiceUnavailable):
+        ac.AsyncNeo4jConnection('bolt://fake', 'neo4j', 'pwd')
+    assert driver.closed
@@ -0,0 +1,51 @@
+from robot_nodes import Action, State
+from robot_relations import TransitTo
+
+
+def counting(query, params):
+    """Каждая строка UNWIND создает один узел или одну связь"""
+    rows = len(params.get('rows', []))
+    return [], {'nodes-created': rows} if 'MERGE (n' in query else {'relationships-created': rows}
+
+
+def test_nodes_are_grouped_by_labels_and_chunked(driver, connection):
+    driver.handler = counting
+    nodes = [State(f's{i}', 'u1', f'S{i}') for i in range(5)] + [Action('go', 'u1', 'GO')]
+
+    assert connection.merge_nodes(nodes, chunk_size=2) == 6
+    statements = driver.statements('UNWIND')
+    assert [len(params['rows']) for _, params in statements] == [2, 2, 1, 1]
+    assert all(':State:' in query for query, _ in statements[:3])
+    assert ':Action:' in statements[3][0]
+    assert statements[0][1]['rows'][0] == {'name': 's0', 'codename': 'S0'}
+
+
+def test_missing_properties_get_own_group(driver, connection):
+    driver.handler = counting
+    connection.merge_nodes([State('a', 'u1', None), State('b', 'u1', 'B')])
+
+    queries = [query for query, _ in driver.statements('UNWIND')]
+    assert len(queries) == 2
+    assert '{name: row.name}' in queries[0]
+    assert '{name: row.name, codename: row.codename}' in queries[1]
+
+
+def test_write_batch_writes_nodes_before_relations(driver, connection):
+    driver.handler = counting
+    idle, busy = State('idle', 'u1', 'IDLE'), State('busy', 'u1', 'BUSY')
+
+    assert connection.write_batch([TransitTo(idle, busy), idle, busy]) == \
+        {'nodes_created': 2, 'relationships_created': 1}
+    statements = driver.statements('UNWIND')
+    assert len(statements) == 2
+    assert 'MERGE (n' in statements[0][0]
+    assert 'MERGE (source)-[:SEMANTIC {name: $rel_name}]->(target)' in statements[1][0]
+    assert statements[1][1] == {'rows': [{'source_name': 'idle', 'target_name': 'busy'}],
+                                'rel_name': TransitTo.rel_name}
+
+
+def test_each_chunk_is_a_separate_transaction(driver, connection):
+    driver.handler = counting
+    connection.merge_nodes([State(f's{i}', 'u1', None) for i in range(3)], chunk_size=1)
+
+    assert driver.commits == 3
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+import b2c_nodes
+import b2c_relations
+import model_io
+import robot_nodes
+import robot_relations
+from fakes import FakeNode
+
+CSV = "kind,class,name,codename,source_class,source_name,target_class,target_name\n" \
+      "node,State,idle,,,,,\n" \
+      "node,State,busy,BUSY,,,,\n"
+
+
+def test_empty_codename_is_left_out_of_merge(driver, connection):
+    stats = model_io.import_model(connection, io.StringIO(CSV), 'u1', robot_nodes, robot_relations, 'csv')
+
+    assert stats['errors'] == []
+    rows = [row for _, params in driver.statements('UNWIND') for row in params['rows']]
+    assert rows == [{'name': 'idle'}, {'name': 'busy', 'codename': 'BUSY'}]
+
+
+def test_null_codename_in_jsonl_is_left_out(driver, connection):
+    lines = ['{"kind": "node", "class": "State", "name": "idle", "codename": null}\n']
+    model_io.import_model(connection, lines, 'u1', robot_nodes, robot_relations)
+
+    assert [params['rows'] for _, params in driver.statements('UNWIND')] == [[{'name': 'idle'}]]
+
+
+def export_handler(query, params):
+    """Модель B2C: событие, созданное правилом, хранит description, которого нет в конструкторе Event"""
+    if 'RETURN a' in query:
+        return [{'a': FakeNode(['B2C', 'Click', 'Action', 'u1'], name='tap')},
+                {'a': FakeNode(['B2C', 'Event', 'u1'], name='main_btn_Click', description='tap')}], {}
+    if 'RETURN s, r, t' in query:
+        return [{'s': FakeNode(['B2C', 'Click', 'Action', 'u1'], name='tap'), 'r': {'name': 'вызывать'},
+                 't': FakeNode(['B2C', 'Event', 'u1'], name='main_btn_Click')}], {}
+    return [], {}
+
+
+@pytest.mark.parametrize('fmt', ['jsonl', 'csv'])
+def test_round_trip_keeps_stored_properties(driver, connection, fmt):
+    driver.handler = export_handler
+    exported = ''.join(model_io.export_model(connection, 'B2C', 'u1', b2c_nodes, b2c_relations, fmt))
+    driver.handler = lambda query, params: ([], {})
+    stats = model_io.import_model(connection, io.StringIO(exported), 'u2', b2c_nodes, b2c_relations, fmt)
+
+    assert stats['errors'] == []
+    merges = {query: params['rows'] for query, params in driver.statements('UNWIND') if 'MERGE (n' in query}
+    event_query = next(query for query in merges if ':Event:' in query)
+    # шаблон совпадает с MERGE правила, поэтому повторный прогон правил не создаст второе событие
+    assert '{name: row.name, description: row.description}' in event_query
+    assert merges[event_query] == [{'name': 'main_btn_Click', 'description': 'tap'}]
+    assert stats['relationships_created'] == 0 and len(driver.statements('MERGE (source)')) == 1
+
+
+def test_property_names_are_validated(connection):
+    lines = ['{"kind": "node", "class": "State", "name": "idle", "properties": {"x}) DETACH DELETE (n": 1}}\n']
+    stats = model_io.import_model(connection, lines, 'u1', robot_nodes, robot_relations)
+
+    assert len(stats['errors']) == 1
+    assert 'invalid property name' in stats['errors'][0]
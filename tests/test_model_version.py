@@ -0,0 +1,80 @@
+import model_cleanup
+import model_version
+import rule_engine
+import pandas as pd
+from robot_nodes import State
+from fakes import nodes_created
+
+
+def test_write_bumps_version_in_same_transaction(driver, connection):
+    driver.handler = nodes_created
+    State('idle', 'u1', 'IDLE').db_create_node(connection)
+
+    assert driver.version('Robot', 'u1') == 1
+    assert driver.commits == 1
+    assert model_version.get_version(connection, 'Robot', 'u1') == 1
+
+
+def test_write_without_changes_keeps_version(driver, connection):
+    State('idle', 'u1', 'IDLE').db_merge_node(connection)
+
+    assert driver.version('Robot', 'u1') == 0
+    assert driver.statements('ModelMeta') == []
+
+
+def test_batch_bumps_once_per_chunk(driver, connection):
+    driver.handler = nodes_created
+    connection.merge_nodes([State(f's{i}', 'u1', None) for i in range(5)], chunk_size=2)
+
+    assert driver.version('Robot', 'u1') == 3
+
+
+def test_artifact_cache_sees_writes_of_other_processes(driver, connection):
+    calls = []
+
+    @model_version.cached_artifact('Robot')
+    def generate(conn, user_label):
+        calls.append(user_label)
+        return len(calls)
+
+    assert generate(connection, 'u1') == 1
+    assert generate(connection, 'u1') == 1
+    # запись приложения в другом процессе (другой воркер) меняет только версию в базе
+    driver.meta[('Robot', 'u1')] = {'version': 7}
+    assert generate(connection, 'u1') == 2
+    assert generate(connection, 'u2') == 3
+
+
+def test_rules_without_changes_keep_version(driver, connection):
+    rules = pd.DataFrame({'code': ['MATCH (n) RETURN n']})
+    rule_engine.run_rules(connection, rules, 'Robot', 'u1', full=True)
+
+    assert driver.version('Robot', 'u1') == 0
+
+
+def test_rules_that_create_bump_version(driver, connection):
+    runs = []
+
+    def handler(query, params):
+        runs.append(query)
+        return [], {'relationships-created': 1} if len(runs) == 1 else {}
+
+    driver.handler = handler
+    rules = pd.DataFrame({'code': ['MATCH (n) MERGE (n)-[:R]->(n)']})
+    rule_engine.run_rules(connection, rules, 'Robot', 'u1', full=True)
+
+    assert driver.version('Robot', 'u1') == 1
+
+
+def test_delete_bumps_only_batches_that_deleted(driver, connection):
+    deleted = iter([3, 0, 2])
+
+    def handler(query, params):
+        if 'count(n)' in query:
+            return [{'total': 5}], {}
+        count = next(deleted)
+        return [], {'nodes-deleted': count} if count else {}
+
+    driver.handler = handler
+    assert model_cleanup.delete_model(connection, 'Robot', 'u1', batch_size=3) == 5
+    assert driver.version('Robot', 'u1') == 2
@@ -0,0 +1,54 @@
+import logging
+
+import pytest
+
+import query_stats
+
+
+def test_profiled_reads_keep_one_fingerprint(connection, monkeypatch):
+    connection.read_query("MATCH (n:Robot) RETURN n")
+    monkeypatch.setattr(query_stats, 'PROFILE_QUERIES', True)
+    connection.read_query("MATCH (n:Robot) RETURN n")
+
+    records = query_stats.get_records()
+    assert [r['statement'] for r in records] == ["MATCH (n:Robot) RETURN n"] * 2
+    assert len({r['fingerprint'] for r in records}) == 1
+
+
+def test_profiled_reads_are_executed_with_profile(driver, connection, monkeypatch):
+    monkeypatch.setattr(query_stats, 'PROFILE_QUERIES', True)
+    connection.read_query("MATCH (n:Robot) RETURN n")
+    connection.write_query("CREATE (n:Robot)")
+
+    assert [query for query, _ in driver.log] == ["PROFILE MATCH (n:Robot) RETURN n", "CREATE (n:Robot)"]
+
+
+def test_consumer_errors_are_not_logged_as_query_failures(driver, connection, caplog):
+    driver.handler = lambda query, params: ([{'n': 1}], {})
+    with caplog.at_level(logging.ERROR, logger=query_stats.logger.name):
+        with pytest.raises(KeyError):
+            with connection.stream("MATCH (n) RETURN n") as records:
+                for row in records:
+                    raise KeyError('name')
+
+    assert caplog.records == []
+    assert query_stats.get_records()[0]['error'] is None
+
+
+def test_work_errors_are_not_logged_as_query_failures(connection, caplog):
+    def work(tx):
+        raise ValueError('bad input')
+
+    with caplog.at_level(logging.ERROR, logger=query_stats.logger.name):
+        with pytest.raises(ValueError):
+            connection.execute_write(work)
+
+    assert caplog.records == []
+
+
+def test_slow_queries_go_to_the_logger(connection, monkeypatch, caplog):
+    monkeypatch.setattr(query_stats, 'SLOW_QUERY_MS', 0)
+    with caplog.at_level(logging.WARNING, logger=query_stats.logger.name):
+        connection.read_query("MATCH (n) RETURN n")
+
+    assert 'Slow query' in caplog.text
@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+
+import rule_engine
+from robot_nodes import State
+
+RULES = pd.DataFrame({'desc': ['r1'], 'code': ['FULL'], 'delta_code': ['DELTA']})
+
+
+@pytest.fixture
+def rule_runs(driver):
+    """Журнал выполненных правил: (текст, $touched); правила ничего не создают"""
+    runs = []
+
+    def handler(query, params):
+        if query in ('FULL', 'DELTA'):
+            runs.append((query, params.get('touched')))
+            return [{'touched': []}], {}
+        return [], {'nodes-created': 1}
+
+    driver.handler = handler
+    return runs
+
+
+def run(connection, **kwargs):
+    _, iterations, mode = rule_engine.run_rules(connection, RULES, 'Robot', 'u1', **kwargs)
+    return mode, iterations
+
+
+def test_first_run_is_full(connection, rule_runs):
+    assert run(connection) == ('full', 1)
+    assert rule_runs == [('FULL', None)]
+
+
+def test_unchanged_model_is_not_evaluated_again(driver, connection, rule_runs):
+    run(connection)
+    assert run(connection) == ('incremental', 0)
+    assert rule_runs == [('FULL', None)]
+    assert driver.version('Robot', 'u1') == 0
+
+
+def test_local_writes_are_evaluated_incrementally(connection, rule_runs):
+    run(connection)
+    State('idle', 'u1', None).db_create_node(connection)
+    State('busy', 'u1', None).db_create_node(connection)
+
+    assert run(connection) == ('incremental', 1)
+    assert sorted(rule_runs[-1][1]) == ['busy', 'idle']
+
+
+def test_unchanged_model_in_new_process_is_not_evaluated(driver, connection, rule_runs):
+    run(connection)
+    # новый процесс: локальных цепочек нет, но версия в базе совпадает с версией прогона
+    rule_engine.model_version._chains.clear()
+    assert run(connection) == ('incremental', 0)
+
+
+def test_writes_of_other_processes_force_full_run(driver, connection, rule_runs):
+    run(connection)
+    State('idle', 'u1', None).db_create_node(connection)
+    driver.meta[('Robot', 'u1')]['version'] += 1
+
+    assert run(connection) == ('full', 1)
+
+
+def test_writes_unknown_to_new_process_force_full_run(driver, connection, rule_runs):
+    run(connection)
+    State('idle', 'u1', None).db_create_node(connection)
+    rule_engine.model_version._chains.clear()
+
+    assert run(connection) == ('full', 1)
+
+
+def test_deletes_force_full_run(driver, connection, rule_runs):
+    run(connection)
+    driver.handler = lambda query, params: ([], {'nodes-deleted': 1})
+    State('idle', 'u1', None).db_delete_node(connection)
+    driver.handler = lambda query, params: ([{'touched': []}], {})
+
+    assert run(connection)[0] == 'full'
+
+
+def test_full_run_on_request(connection, rule_runs):
+    run(connection)
+    assert run(connection, full=True) == ('full', 1)
+
+
+def test_rule_output_is_not_evaluated_again(driver, connection):
+    created = iter([1, 0])
+
+    def handler(query, params):
+        return [{'touched': ['x']}], {'nodes-created': next(created, 0)}
+
+    driver.handler = handler
+    assert run(connection) == ('full', 2)
+    assert driver.version('Robot', 'u1') == 1
+    assert driver.rules_version('Robot', 'u1') == 1
+    assert run(connection) == ('incremental', 0)
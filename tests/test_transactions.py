@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+from neo4j import READ_ACCESS, WRITE_ACCESS
+
+import model_version
+import rule_engine
+from robot_nodes import State
+from fakes import nodes_created
+
+
+def test_write_is_retried_after_transient_error(driver, connection):
+    driver.handler = nodes_created
+    driver.failures = 2
+    State('idle', 'u1', None).db_create_node(connection)
+
+    assert driver.retries == 2
+    assert driver.commits == 1
+    # версия, увеличенная в откаченных попытках, не фиксируется
+    assert driver.version('Robot', 'u1') == 1
+
+
+def test_retried_write_is_registered_once(driver, connection):
+    driver.handler = nodes_created
+    model_version.reset_touched('Robot', 'u1', 0)
+    driver.failures = 1
+    State('idle', 'u1', None).db_create_node(connection)
+
+    assert model_version._chains[('Robot', 'u1')] == {'base': 0, 'known': 1, 'touched': {'idle'}}
+
+
+def test_rules_are_rerun_from_scratch_after_retry(driver, connection):
+    counts = iter([1, 0, 1, 0])
+    driver.handler = lambda query, params: ([], {'nodes-created': next(counts)})
+    driver.failures = 1
+    rules = pd.DataFrame({'code': ['MATCH (n) MERGE (n)-[:R]->(:X)']})
+    stats_df, iterations, _ = rule_engine.run_rules(connection, rules, 'Robot', 'u1', full=True)
+
+    # статистика относится к зафиксированной попытке, а не суммируется с откаченной
+    assert list(stats_df['nodes_created']) == [1]
+    assert iterations == 2
+    assert driver.version('Robot', 'u1') == 1
+
+
+def test_reads_and_writes_are_routed(driver, connection):
+    connection.read_query("MATCH (n) RETURN n")
+    connection.write_query("CREATE (n)")
+    connection.execute_read(lambda tx: None)
+
+    assert driver.sessions_access_mode == [READ_ACCESS, WRITE_ACCESS, READ_ACCESS]
+
+
+def test_errors_of_work_are_not_retried(driver, connection):
+    calls = []
+
+    def work(tx):
+        calls.append(1)
+        raise ValueError('bad input')
+
+    with pytest.raises(ValueError):
+        connection.execute_write(work)
+    assert calls == [1]
+
+
+def test_sessions_share_one_bookmark_manager(driver, connection):
+    connection.write_query("CREATE (n)")
+    connection.read_query("MATCH (n) RETURN n")
+    with connection.stream("MATCH (n) RETURN n") as records:
+        list(records)
+    with connection.unit_of_work() as uow:
+        uow.read_query("MATCH (n) RETURN n")
+    connection.ensure_alive(interval=0)
+    connection.reconnect()
+    connection.read_query("MATCH (n) RETURN n")
+
+    managers = driver.sessions_bookmark_manager
+    assert len(managers) == 6
+    assert managers[0] is not None
+    assert all(manager is connection.bookmark_manager for manager in managers)
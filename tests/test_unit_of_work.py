@@ -0,0 +1,71 @@
+import pytest
+
+import model_version
+import query_stats
+from robot_nodes import State
+from fakes import nodes_created
+
+
+def test_statements_share_one_commit(driver, connection):
+    driver.handler = nodes_created
+    with connection.unit_of_work() as uow:
+        State('idle', 'u1', None).db_create_node(uow)
+        State('busy', 'u1', None).db_create_node(uow)
+
+    assert driver.commits == 1
+    assert driver.version('Robot', 'u1') == 2
+
+
+def test_exception_rolls_back(driver, connection):
+    driver.handler = nodes_created
+    with pytest.raises(RuntimeError):
+        with connection.unit_of_work() as uow:
+            State('idle', 'u1', None).db_create_node(uow)
+            raise RuntimeError('form validation failed')
+
+    assert driver.commits == 0
+    assert driver.rollbacks == 1
+    assert driver.version('Robot', 'u1') == 0
+
+
+def test_versions_are_registered_after_commit(driver, connection):
+    driver.handler = nodes_created
+    model_version.reset_touched('Robot', 'u1', 0)
+    with connection.unit_of_work() as uow:
+        State('idle', 'u1', None).db_create_node(uow)
+        assert model_version.get_touched('Robot', 'u1', 1, 0) is None
+
+    assert model_version.get_touched('Robot', 'u1', 1, 0) == {'idle'}
+
+
+def test_rollback_discards_buffered_versions(driver, connection):
+    driver.handler = nodes_created
+    model_version.reset_touched('Robot', 'u1', 0)
+    with pytest.raises(RuntimeError):
+        with connection.unit_of_work() as uow:
+            State('idle', 'u1', None).db_create_node(uow)
+            raise RuntimeError('form validation failed')
+
+    assert model_version._chains[('Robot', 'u1')] == {'base': 0, 'known': 0, 'touched': set()}
+
+
+def test_read_all(driver, connection):
+    driver.handler = lambda query, params: ([{'q': query, 'p': params}], {})
+    with connection.unit_of_work() as uow:
+        res = uow.read_all([("RETURN 1", {'a': 1}), ("RETURN 2", None)])
+
+    assert res == [[{'q': "RETURN 1", 'p': {'a': 1}}], [{'q': "RETURN 2", 'p': {}}]]
+
+
+def test_stream_is_instrumented(driver, connection, monkeypatch):
+    monkeypatch.setattr(query_stats, 'PROFILE_QUERIES', True)
+    driver.handler = lambda query, params: ([{'n': 1}, {'n': 2}], {})
+    with connection.unit_of_work(fetch_size=50) as uow:
+        with uow.stream("MATCH (n) RETURN n") as records:
+            assert [r['n'] for r in records] == [1, 2]
+
+    assert driver.sessions_fetch_size == [50]
+    assert driver.log[0][0] == "PROFILE MATCH (n) RETURN n"
+    stream_record = query_stats.get_records()[0]
+    assert stream_record['statement'] == "MATCH (n) RETURN n"
+    assert stream_record['rows'] == 2